@@ -1,9 +1,38 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime
+import functools
+import hashlib
+import json
+import os
+import re
+import time
+import threading
+import uuid
+from collections import OrderedDict
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+from order_core import (
+    COMPARISON_MODES, DATE_FIELDS, EXCEL_MAX_ROWS, EXPORT_CHUNK_ROWS, EXPORT_FORMATS, NUMERIC_FIELDS, SQL_BACKENDS, SQLITE_EXTENSIONS,
+    FilterEngine, SQLBackend, SiteRollups, StatusKpiKernel, baseline_range, build_fill_sketch, build_order_cube, categorize_columns,
+    append_orders, comparison_filters, complete_parsing_plan, compute_kpis, cube_col_mapping, detect_columns, fill_rate_distribution, finalize_order_cube, get_parsing_plan,
+    guess_date_formats, ingest_delta, ingest_sources, lead_time_distribution, list_local_sources, load_status_map, merge_order_cubes,
+    normalize_dataframe, order_keys, plan_col_mapping,
+    read_appended_csv, read_with_plan, slice_period, sort_by_create_date, sqlite_watermarks, update_fill_sketch, update_order_cube, upsert_orders,
+    write_export
+)
+from order_charts import (
+    build_delivery_figure, build_fill_rate_figure, build_lead_time_figure, build_plant_figure, build_status_figure,
+    build_trend_figure
+)
+from order_metrics import StageMetrics, begin_run, end_run, stage, track_run
 
 # Konfigurasi halaman
 st.set_page_config(
@@ -48,6 +77,12 @@ st.markdown("""
         margin: 2px 0 0 0;
         font-family: 'Orbitron', monospace;
     }
+    .metric-delta {
+        font-size: 0.7em;
+        margin: 1px 0 0 0;
+        font-family: 'Orbitron', monospace;
+        line-height: 1.1;
+    }
     .stPlotlyChart {
         border-radius: 12px;
         background: linear-gradient(135deg, #1E2130 0%, #2D3250 100%);
@@ -115,244 +150,943 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Fungsi untuk membuat metric card
-def create_metric_card(label, value, background="linear-gradient(135deg, #1E3A8A 0%, #0369A1 100%)", border_color="#00FF88"):
+def create_metric_card(label, value, background="linear-gradient(135deg, #1E3A8A 0%, #0369A1 100%)", border_color="#00FF88", delta=""):
     return f"""
     <div class="metric-card" style="background: {background}; border-color: {border_color}">
         <p class="metric-value">{value}</p>
-        <p class="metric-label">{label}</p>
+        <p class="metric-label">{label}</p>{delta}
     </div>
     """
 
-# Fungsi untuk memproses data
-@st.cache_data
-def process_uploaded_file(uploaded_file, header_row=0):
+# Fungsi untuk baris delta di metric card (selisih dan persen terhadap periode pembanding)
+def format_delta(current, baseline):
+    if baseline is None:
+        return ""
+    change = current - baseline
+    arrow, color = ("▲", "#00FF88") if change > 0 else ("▼", "#FF6B6B") if change < 0 else ("■", "rgba(255, 255, 255, 0.8)")
+    percent = f" ({change / baseline * 100:+.1f}%)" if baseline else ""
+    return f'<p class="metric-delta" style="color: {color}">{arrow} {change:+,.0f}{percent}</p>'
+
+# Struktur turunan per dataset disimpan di entry store dataset itu (DatasetStore.derived):
+# ukurannya masuk budget store dan ikut dibuang saat dataset di-evict.
+
+# Fungsi untuk mendapatkan filter engine per dataset
+def get_filter_engine(store_key, df, col_mapping):
+    return get_dataset_store().derived(store_key, 'filter_engine', lambda: FilterEngine(df, col_mapping))
+
+# Fungsi untuk rollup plant -> site per dataset (dihitung sekali saat dataset dimuat)
+def get_site_rollups(store_key, df, col_mapping):
+    return get_dataset_store().derived(store_key, 'site_rollups', lambda: SiteRollups(df, col_mapping))
+
+# Fungsi untuk sketch fill rate per dataset beserta filter engine-nya (dihitung sekali per dataset)
+def get_fill_sketch(store_key, df, col_mapping):
+    def build():
+        sketch = build_fill_sketch(df, col_mapping)
+        if sketch is None:
+            return None, None
+        return sketch, FilterEngine(sketch, cube_col_mapping(sketch))
+    return get_dataset_store().derived(store_key, 'fill_sketch', build)
+
+# Fungsi untuk mendapatkan filter engine cube per dataset
+def get_cube_engine(store_key, cube):
+    return get_dataset_store().derived(store_key, 'cube_engine', lambda: FilterEngine(cube, cube_col_mapping(cube)))
+
+# Konfigurasi cache dataset di disk (Parquet, dikunci dengan hash isi file + header row)
+CACHE_DIR = os.environ.get('ORDER_CACHE_DIR', '.order_cache')
+CACHE_MAX_BYTES = int(float(os.environ.get('ORDER_CACHE_MAX_MB', '2048')) * 1024 * 1024)
+
+# Fungsi untuk path file cache dari key dataset (baris, metadata, cube)
+def cache_paths(dataset_key):
+    name = os.path.join(CACHE_DIR, dataset_key.replace(':', '_'))
+    return f"{name}.parquet", f"{name}.json", f"{name}.cube.parquet"
+
+# Fungsi untuk membaca dataset kanonik dari cache disk (memory-mapped);
+# dengan load_rows=False hanya metadata dan cube yang dibaca (mode out-of-core).
+# Baris yang ditulis ingestion out-of-core masih berurutan file dan plant/status-nya string:
+# saat pertama kali dimuat penuh, baris dikanonikkan (kategori, urut CreateDate) lalu cache ditulis ulang.
+def read_cached_dataset(dataset_key, load_rows=True):
+    if pyarrow is None:
+        return None
+    data_path, meta_path, cube_path = cache_paths(dataset_key)
+    if not all(os.path.exists(path) for path in (data_path, meta_path, cube_path)):
+        return None
     try:
-        if uploaded_file.name.endswith('.csv'):
-            df = pd.read_csv(uploaded_file, header=header_row)
-        elif uploaded_file.name.endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(uploaded_file, engine='openpyxl', header=header_row)
-        else:
-            return None
-        
-        # Bersihkan data
-        df.columns = [str(col).strip() for col in df.columns]
-        df = df.dropna(axis=1, how='all')
-        df = df.dropna(how='all')
-        
-        return df
+        with open(meta_path) as f:
+            meta = json.load(f)
+        cube = finalize_order_cube(pd.read_parquet(cube_path))
+        df = pd.read_parquet(data_path, memory_map=True) if load_rows else None
+    except Exception:
+        return None
+    col_mapping = meta['col_mapping']
+    if df is not None and meta.get('layout') != 'canonical':
+        df = sort_by_create_date(categorize_columns(df, col_mapping), col_mapping)
+        write_cached_dataset(dataset_key, df, col_mapping, meta.get('source_name'), cube)
+        return df, col_mapping, cube
+    meta['last_access'] = time.time()
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f)
+    return df, col_mapping, cube
+
+# Fungsi untuk menulis dataset kanonik ke cache disk; df=None berarti
+# baris sudah ditulis langsung ke data_path oleh ingestion streaming
+def write_cached_dataset(dataset_key, df, col_mapping, source_name, cube):
+    if pyarrow is None:
+        return
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    data_path, meta_path, cube_path = cache_paths(dataset_key)
+    try:
+        if df is not None:
+            df.to_parquet(data_path + '.tmp', index=False)
+            os.replace(data_path + '.tmp', data_path)
+        cube.to_parquet(cube_path, index=False)
+        schema = pyarrow.parquet.read_schema(data_path)
     except Exception as e:
-        st.error(f"Error processing file: {str(e)}")
+        st.warning(f"Dataset cache not written: {str(e)}")
+        return
+    meta = {
+        'dataset_key': dataset_key,
+        'source_name': source_name,
+        'col_mapping': col_mapping,
+        'layout': 'canonical' if df is not None else 'file-order',
+        'dtypes': {name: str(schema.field(name).type) for name in schema.names},
+        'rows': int(cube['Orders'].sum()),
+        'bytes': os.path.getsize(data_path) + os.path.getsize(cube_path),
+        'created': time.time(),
+        'last_access': time.time()
+    }
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f)
+    evict_cached_datasets()
+
+# Fungsi untuk mendapatkan backend SQL per dataset (koneksi dibagi antar session)
+def get_sql_backend(store_key, engine, df, col_mapping):
+    def build():
+        data_path = cache_paths(store_key[0])[0]
+        parquet_path = data_path if pyarrow is not None and os.path.exists(data_path) else None
+        with st.spinner("Loading data into the query engine..."):
+            return SQLBackend(engine, col_mapping, parquet_path, df, sqlite_path(store_key[0]))
+    return get_dataset_store().derived(store_key, f"sql_{engine}", build)
+
+# Fungsi untuk path file SQLite dataset
+def sqlite_path(dataset_key):
+    return os.path.join(CACHE_DIR, dataset_key.replace(':', '_') + '.sqlite')
+
+# Fungsi untuk daftar dataset di cache disk (terbaru dipakai lebih dulu)
+def list_cached_datasets():
+    if not os.path.isdir(CACHE_DIR):
+        return []
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        if name.endswith('.json'):
+            try:
+                with open(os.path.join(CACHE_DIR, name)) as f:
+                    entries.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    return sorted(entries, key=lambda meta: meta.get('last_access', 0), reverse=True)
+
+# Fungsi untuk menghapus satu dataset dari cache disk. Backend SQL yang membaca file itu
+# dibuang, begitu juga dataset out-of-core di store (barisnya hanya ada di file tersebut).
+def purge_cached_dataset(dataset_key):
+    for path in cache_paths(dataset_key) + (sqlite_path(dataset_key),):
+        if os.path.exists(path):
+            os.remove(path)
+    get_dataset_store().release_cache_files(dataset_key)
+
+# Fungsi untuk eviction LRU sampai total ukuran cache di bawah batas
+def evict_cached_datasets(max_bytes=None):
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = list_cached_datasets()
+    total = sum(meta.get('bytes', 0) for meta in entries)
+    # Dataset yang dirujuk snapshot atau sedang dipakai session tidak di-evict (hanya lewat purge manual)
+    pinned = {snapshot['store_key'][0] for snapshot in list_snapshots()} | get_dataset_store().in_use()
+    entries = [meta for meta in entries if meta['dataset_key'] not in pinned]
+    while entries and total > max_bytes:
+        oldest = entries.pop()
+        purge_cached_dataset(oldest['dataset_key'])
+        total -= oldest.get('bytes', 0)
+
+# Fungsi untuk mendapatkan key dataset (hash isi file, dihitung sekali per upload)
+def get_dataset_key(uploaded_file, header_row=0):
+    hashes = st.session_state.setdefault('file_hashes', {})
+    file_key = (uploaded_file.file_id, header_row)
+    if file_key not in hashes:
+        digest = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+        hashes[file_key] = f"{digest}:{header_row}"
+    return hashes[file_key]
+
+# Fungsi untuk file yang membentuk isi sumber lokal. Untuk SQLite mode WAL, file -wal
+# ikut dihitung karena perubahan baru ada di sana.
+def local_source_files(path):
+    return [path, path + '-wal'] if os.path.exists(path + '-wal') else [path]
+
+# Fungsi untuk hash isi file lokal sebagai key (tanpa session state, bisa dipanggil dari thread lain)
+def hash_local_source(path, header_row=0):
+    digests = []
+    for file_path in local_source_files(path):
+        with open(file_path, 'rb') as f:
+            digests.append(hashlib.file_digest(f, 'sha256').hexdigest())
+    digest = digests[0] if len(digests) == 1 else hashlib.sha256(''.join(digests).encode('utf-8')).hexdigest()
+    return f"{digest}:{header_row}"
+
+# Fungsi untuk key file lokal (hash isi, dihitung ulang hanya jika ukuran/mtime berubah)
+def get_path_key(path, header_row=0):
+    hashes = st.session_state.setdefault('file_hashes', {})
+    stats = tuple((stat.st_size, stat.st_mtime_ns) for stat in map(os.stat, local_source_files(path)))
+    file_key = (path, stats, header_row)
+    if file_key not in hashes:
+        # Versi lama file yang sama tidak akan dipakai lagi
+        for stale in [key for key in hashes if len(key) == 3 and key[0] == path and key[2] == header_row]:
+            del hashes[stale]
+        hashes[file_key] = hash_local_source(path, header_row)
+    return hashes[file_key]
+
+# Fungsi untuk menggabungkan key beberapa sumber menjadi satu key dataset
+def combine_source_keys(keys, header_row=0):
+    if len(keys) == 1:
+        return keys[0]
+    digest = hashlib.sha256('|'.join(sorted(keys)).encode('utf-8')).hexdigest()
+    return f"{digest}:{header_row}"
+
+# Fungsi untuk key gabungan beberapa sumber (upload dan file lokal)
+def get_sources_key(sources, header_row=0):
+    keys = [get_path_key(source, header_row) if isinstance(source, str) else get_dataset_key(source, header_row) for source in sources]
+    return combine_source_keys(keys, header_row)
+
+# Fungsi untuk nama tampilan sumber data
+def sources_label(sources):
+    names = [os.path.basename(source) if isinstance(source, str) else source.name for source in sources]
+    return names[0] if len(names) == 1 else f"{names[0]} + {len(names) - 1} more"
+
+# Folder parsing plan (profil layout export) di cache disk
+PLAN_DIR = os.path.join(CACHE_DIR, 'profiles')
+
+# File mapping status mentah -> bucket kartu KPI (JSON, opsional)
+STATUS_MAP_PATH = os.environ.get('ORDER_STATUS_MAP', 'status_map.json')
+
+# Fungsi untuk kernel KPI status dari file mapping (dibuat ulang hanya kalau file berubah)
+@st.cache_resource(max_entries=2)
+def get_status_kernel(path, mtime):
+    return StatusKpiKernel(load_status_map(path))
+
+# Konfigurasi instrumentasi per tahap (path kosong = file/log tidak ditulis)
+METRICS_FILE = os.environ.get('ORDER_METRICS_FILE', os.path.join(CACHE_DIR, 'metrics.prom'))
+METRICS_LOG = os.environ.get('ORDER_METRICS_LOG', os.path.join(CACHE_DIR, 'metrics.log'))
+METRICS_PANEL = os.environ.get('ORDER_METRICS_PANEL', '1') != '0'
+
+# Fungsi untuk agregat metrics per tahap (satu untuk semua session di proses ini)
+@st.cache_resource
+def get_stage_metrics():
+    return StageMetrics(METRICS_FILE or None, METRICS_LOG or None)
+
+# Fungsi decorator untuk fragment: kalau fragment di-rerun sendiri (tanpa script penuh),
+# tahapnya dicatat sebagai run terpisah dengan nama run_name
+def tracked_run(run_name):
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with track_run(run_name, get_stage_metrics().publish):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+# Konfigurasi ingestion streaming untuk file CSV besar
+INGESTION_MODES = ['Auto', 'Standard', 'Streaming', 'Out-of-core']
+STREAM_CHUNK_ROWS = int(os.environ.get('ORDER_STREAM_CHUNK_ROWS', '250000'))
+STREAM_THRESHOLD_BYTES = int(float(os.environ.get('ORDER_STREAM_THRESHOLD_MB', '100')) * 1024 * 1024)
+
+# Fungsi untuk memproyeksikan chunk ke kolom terpetakan dengan tipe tetap,
+# supaya skema Parquet sama untuk setiap chunk
+def project_for_storage(chunk, col_mapping):
+    projected = {}
+    for field, col in col_mapping.items():
+        if not col or col in projected:
+            continue
+        if field in DATE_FIELDS:
+            projected[col] = chunk[col].astype('datetime64[ns]')
+        elif field in NUMERIC_FIELDS:
+            projected[col] = chunk[col].astype('float64')
+        else:
+            projected[col] = chunk[col].astype('string')
+    return pd.DataFrame(projected)
+
+# Fungsi untuk ingestion CSV per chunk: setiap chunk dibersihkan, diberi tipe dan
+# langsung diagregasi ke cube. Dengan data_path, baris ditulis ke Parquet (out-of-core)
+# dan tidak disimpan di memori.
+def stream_csv_dataset(source, header_row=0, data_path=None, progress=None, total_bytes=None, plan=None):
+    # Kolom angka tetap lewat to_numeric per chunk, agar nilai kotor di tengah file tidak menggagalkan stream
+    text_dtype = {'dtype': plan['text_dtype']} if plan else {}
+    reader = read_with_plan(source, header_row, plan, chunksize=STREAM_CHUNK_ROWS, **text_dtype)
+    col_mapping = date_formats = writer = schema = cube = None
+    chunks = []
+    rows = 0
+    start = time.time()
+    try:
+        for chunk in reader:
+            chunk.columns = [str(col).strip() for col in chunk.columns]
+            chunk = chunk.dropna(how='all')
+            if col_mapping is None:
+                col_mapping = plan_col_mapping(plan, chunk) if plan else detect_columns(chunk)
+                if plan and not plan['complete']:
+                    complete_parsing_plan(plan, chunk, PLAN_DIR)
+                date_formats = guess_date_formats(chunk, col_mapping)
+            chunk = normalize_dataframe(chunk, col_mapping, date_formats)
+            chunk_cube = build_order_cube(chunk, col_mapping)
+            cube = chunk_cube if cube is None else merge_order_cubes([cube, chunk_cube])
+            if data_path:
+                table = pyarrow.Table.from_pandas(project_for_storage(chunk, col_mapping), schema=schema, preserve_index=False)
+                if writer is None:
+                    schema = table.schema
+                    writer = pyarrow.parquet.ParquetWriter(data_path + '.tmp', schema)
+                writer.write_table(table)
+            else:
+                chunks.append(chunk)
+            rows += len(chunk)
+            if progress:
+                fraction = min(source.tell() / total_bytes, 1.0) if total_bytes else 0.0
+                progress(rows, time.time() - start, fraction)
+    finally:
+        if writer is not None:
+            writer.close()
+    if col_mapping is None:
         return None
+    if data_path:
+        os.replace(data_path + '.tmp', data_path)
+        return None, col_mapping, cube
+    df = pd.concat(chunks, ignore_index=True).dropna(axis=1, how='all')
+    df = sort_by_create_date(categorize_columns(df, col_mapping), col_mapping)
+    return df, col_mapping, cube
 
-# Fungsi untuk menemukan kolom
-def find_column(df, target_names):
-    target_names = [str(name).lower().replace(' ', '').replace('_', '') for name in target_names]
-    
-    for col in df.columns:
-        normalized_col = str(col).lower().replace(' ', '').replace('_', '')
-        for target in target_names:
-            if normalized_col == target:
-                return col
-    return None
+# Fungsi untuk membaca dataset kanonik beserta cube-nya (disk cache atau ingestion).
+# Pada mode out-of-core df bernilai None. Sumber berupa file upload atau path lokal;
+# banyak file/sheet dibaca paralel oleh ingest_sources.
+def read_dataset(dataset_key, _sources, header_row=0, mode='Standard'):
+    out_of_core = mode == 'Out-of-core' and pyarrow is not None
+    with stage('read_cache'):
+        cached = read_cached_dataset(dataset_key, load_rows=not out_of_core)
+    if cached is not None:
+        return cached
+    single_csv = len(_sources) == 1 and sources_label(_sources).endswith('.csv')
+    if mode in ('Streaming', 'Out-of-core') and single_csv:
+        source = open(_sources[0], 'rb') if isinstance(_sources[0], str) else _sources[0]
+        total_bytes = os.path.getsize(_sources[0]) if isinstance(_sources[0], str) else source.size
+        data_path = None
+        if out_of_core:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            data_path = cache_paths(dataset_key)[0]
+        # Progress ingestion streaming (baris dan rows/sec)
+        progress_bar = st.progress(0.0, text="📥 Streaming ingestion...")
+        def show_progress(rows, elapsed, fraction):
+            progress_bar.progress(fraction, text=f"📥 {rows:,} rows • {rows / max(elapsed, 1e-6):,.0f} rows/s")
+        try:
+            with stage('stream_ingest') as record:
+                plan = get_parsing_plan(source, header_row, PLAN_DIR)
+                result = stream_csv_dataset(source, header_row, data_path, show_progress, total_bytes, plan)
+                record['rows_out'] = int(result[2]['Orders'].sum()) if result is not None else 0
+        except Exception as e:
+            st.error(f"Error processing file: {str(e)}")
+            result = None
+        finally:
+            if isinstance(_sources[0], str):
+                source.close()
+        progress_bar.empty()
+        if result is None:
+            return None, {}, None
+        df, col_mapping, cube = result
+    else:
+        sources = [source if isinstance(source, str) else (source.name, source.getvalue()) for source in _sources]
+        try:
+            with stage('ingest') as record:
+                df, col_mapping = ingest_sources(sources, header_row, PLAN_DIR)
+                record['rows_out'] = len(df) if df is not None else 0
+        except Exception as e:
+            st.error(f"Error processing file: {str(e)}")
+            df = None
+        if df is None:
+            return None, {}, None
+        with stage('build_cube', len(df)) as record:
+            cube = build_order_cube(df, col_mapping)
+            record['rows_out'] = len(cube)
+    write_cached_dataset(dataset_key, df, col_mapping, sources_label(_sources), cube)
+    return df, col_mapping, cube
 
-# Initialize session state
-if 'df' not in st.session_state:
-    st.session_state.df = None
-if 'col_mapping' not in st.session_state:
-    st.session_state.col_mapping = {}
+# Konfigurasi store dataset bersama (satu salinan per dataset untuk semua session)
+STORE_MAX_BYTES = int(float(os.environ.get('ORDER_MEMORY_BUDGET_MB', '4096')) * 1024 * 1024)
+STORE_SESSION_TTL = int(os.environ.get('ORDER_SESSION_TTL_SECONDS', '1800'))
 
-# Sidebar
-with st.sidebar:
-    st.markdown("""
-    <div style='text-align: center; padding: 10px 0;'>
-        <h2 style='color: #00FF88; margin: 0; font-size: 1.2em;'>📊 FILTERS</h2>
-    </div>
-    """, unsafe_allow_html=True)
-    st.markdown("---")
+# Fungsi untuk ukuran dataset di memori (baris + cube)
+def dataset_nbytes(df, cube):
+    return sum(int(frame.memory_usage(deep=True).sum()) for frame in (df, cube) if frame is not None)
+
+# Fungsi untuk perkiraan ukuran struktur turunan: array numpy yang memiliki datanya sendiri
+# (view ke kolom frame tidak dihitung dua kali), frame/index pandas, isi tuple/dict dan atribut
+# objek seperti FilterEngine/SiteRollups; objek dengan atribut nbytes (backend SQL) melaporkan sendiri
+def object_nbytes(value, seen=None):
+    seen = set() if seen is None else seen
+    if value is None or id(value) in seen:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, np.ndarray):
+        return value.nbytes if value.base is None else 0
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, dict):
+        return sum(object_nbytes(item, seen) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(object_nbytes(item, seen) for item in value)
+    if isinstance(getattr(value, 'nbytes', None), int):
+        return value.nbytes
+    if hasattr(value, '__dict__'):
+        return sum(object_nbytes(item, seen) for item in vars(value).values())
+    return 0
+
+# Store dataset process-wide: session hanya menyimpan key-nya dan memakai objek yang sama.
+# LRU dengan batas byte; dataset yang masih dipakai session aktif (terlihat dalam
+# STORE_SESSION_TTL detik terakhir) tidak pernah di-evict. Setiap entry juga memegang struktur
+# turunan dataset-nya (filter engine, rollup, sketch, index OrderID, backend SQL).
+class DatasetStore:
+    def __init__(self, max_bytes, session_ttl):
+        self.max_bytes = max_bytes
+        self.session_ttl = session_ttl
+        self.entries = OrderedDict()
+        self.sessions = {}
+        self.load_locks = {}
+        self.lock = threading.Lock()
     
-    # Upload File
-    uploaded_file = st.file_uploader("📤 Upload Data File", type=['csv', 'xlsx', 'xls'])
+    # Dataset (df, col_mapping, cube) untuk key, atau None
+    def get(self, store_key):
+        with self.lock:
+            entry = self.entries.get(store_key)
+            if entry is None:
+                return None
+            self.entries.move_to_end(store_key)
+            return entry['dataset']
     
-    if uploaded_file:
-        df = process_uploaded_file(uploaded_file)
-        if df is not None:
-            st.session_state.df = df
-            st.success("✅ Data loaded successfully!")
-            
-            # Auto-detect columns
-            col_mapping = {
-                'CreateDate': find_column(df, ['CreateDate', 'Create Date', 'TanggalBuat']),
-                'DeliveryDate': find_column(df, ['Delivery Date', 'DeliveryDate', 'TanggalKirim']),
-                'PlantName': find_column(df, ['Plant Name', 'PlantName', 'NamaPlant']),
-                'Status': find_column(df, ['Status', 'OrderStatus']),
-                'OrderQty': find_column(df, ['Order Qty', 'OrderQty', 'Quantity']),
-                'ActualDelivery': find_column(df, ['Actual Delivery', 'ActualDelivery', 'DeliveredQty']),
-                'OrderID': find_column(df, ['Order ID', 'OrderID']),
-                'SiteNo': find_column(df, ['Site No', 'SiteNo']),
-                'SiteName': find_column(df, ['Site Name', 'SiteName'])
-            }
-            st.session_state.col_mapping = col_mapping
-            
-            # Display detected columns
-            st.info("🔍 Detected Columns:")
-            for display_name, actual_col in col_mapping.items():
-                if actual_col:
-                    st.write(f"• {display_name}: `{actual_col}`")
-            
-            st.markdown("---")
-            
-            # Filters
-            if col_mapping['CreateDate']:
-                create_dates = pd.to_datetime(df[col_mapping['CreateDate']], errors='coerce').dropna()
-                if not create_dates.empty:
-                    min_date = create_dates.min()
-                    max_date = create_dates.max()
-                    create_date_range = st.date_input(
-                        "📅 Create Date Range",
-                        [min_date, max_date],
-                        min_value=min_date,
-                        max_value=max_date
-                    )
-            
-            if col_mapping['DeliveryDate']:
-                delivery_dates = pd.to_datetime(df[col_mapping['DeliveryDate']], errors='coerce').dropna()
-                if not delivery_dates.empty:
-                    min_date = delivery_dates.min()
-                    max_date = delivery_dates.max()
-                    delivery_date_range = st.date_input(
-                        "🚚 Delivery Date Range",
-                        [min_date, max_date],
-                        min_value=min_date,
-                        max_value=max_date
-                    )
-            
-            if col_mapping['PlantName']:
-                plant_options = df[col_mapping['PlantName']].unique()
-                plant_options = [str(opt) for opt in plant_options if pd.notna(opt)]
-                selected_plants = st.multiselect(
-                    "🏭 Plant Name",
-                    options=plant_options,
-                    default=plant_options,
-                    help="Select all plants or choose specific ones"
-                )
-                
-                # Add "Select All" functionality
-                col1, col2 = st.columns(2)
-                with col1:
-                    if st.button("Select All Plants", key="select_all_plants"):
-                        selected_plants = plant_options
-                with col2:
-                    if st.button("Clear All", key="clear_all_plants"):
-                        selected_plants = []
-            
-            if col_mapping['Status']:
-                status_options = df[col_mapping['Status']].unique()
-                status_options = [str(opt) for opt in status_options if pd.notna(opt)]
-                selected_status = st.multiselect(
-                    "📋 Status",
-                    options=status_options,
-                    default=status_options,
-                    help="Select all statuses or choose specific ones"
-                )
-                
-                # Add "Select All" functionality
-                col1, col2 = st.columns(2)
-                with col1:
-                    if st.button("Select All Status", key="select_all_status"):
-                        selected_status = status_options
-                with col2:
-                    if st.button("Clear All", key="clear_all_status"):
-                        selected_status = []
-            
-            # Store filter values in session state
-            st.session_state.filters = {
-                'create_date_range': create_date_range if 'create_date_range' in locals() else None,
-                'delivery_date_range': delivery_date_range if 'delivery_date_range' in locals() else None,
-                'selected_plants': selected_plants if 'selected_plants' in locals() else None,
-                'selected_status': selected_status if 'selected_status' in locals() else None
+    # Lock per key, supaya session yang membuka file yang sama tidak membacanya dua kali
+    def load_lock(self, store_key):
+        with self.lock:
+            return self.load_locks.setdefault(store_key, threading.Lock())
+    
+    # Menyimpan dataset; derived boleh berisi struktur turunan yang sudah jadi (misalnya hasil update inkremental)
+    def put(self, store_key, dataset, derived=None):
+        df, col_mapping, cube = dataset
+        derived = dict(derived or {})
+        with self.lock:
+            self.entries[store_key] = {
+                'dataset': dataset,
+                'derived': derived,
+                'bytes': dataset_nbytes(df, cube) + sum(object_nbytes(value) for value in derived.values())
             }
-
-# Main Content - Compact Header
-st.markdown("""
-<div style='text-align: center; padding: 5px 0;'>
-    <h1 style='color: #00FF88; font-size: 1.8em; margin: 0;'>📊 ORDER & DELIVERY DASHBOARD</h1>
-</div>
-""", unsafe_allow_html=True)
-
-st.markdown("---")
-
-# Display data and visualizations
-if st.session_state.df is not None and st.session_state.col_mapping:
-    df = st.session_state.df
-    col_mapping = st.session_state.col_mapping
-    filters = st.session_state.get('filters', {})
+            self.entries.move_to_end(store_key)
+            self._evict(keep=store_key)
     
-    # Apply filters
-    filtered_df = df.copy()
+    # Struktur turunan dataset: dibuat sekali per entry, ukurannya ditambahkan ke entry.
+    # Kalau dataset tidak (lagi) ada di store, hasil build dikembalikan tanpa disimpan.
+    def derived(self, store_key, name, build):
+        with self.lock:
+            entry = self.entries.get(store_key)
+            if entry is not None and name in entry['derived']:
+                return entry['derived'][name]
+        value = build()
+        with self.lock:
+            entry = self.entries.get(store_key)
+            if entry is not None:
+                if name in entry['derived']:
+                    return entry['derived'][name]
+                entry['derived'][name] = value
+                entry['bytes'] += object_nbytes(value)
+                self._evict(keep=store_key)
+        return value
     
-    if filters.get('create_date_range') and col_mapping['CreateDate']:
-        mask = pd.to_datetime(filtered_df[col_mapping['CreateDate']], errors='coerce').between(
-            pd.to_datetime(filters['create_date_range'][0]),
-            pd.to_datetime(filters['create_date_range'][1])
-        )
-        filtered_df = filtered_df[mask]
+    # Struktur turunan yang sudah ada untuk entry (tanpa membangunnya), atau None
+    def peek_derived(self, store_key, name):
+        with self.lock:
+            entry = self.entries.get(store_key)
+            return entry['derived'].get(name) if entry is not None else None
     
-    if filters.get('delivery_date_range') and col_mapping['DeliveryDate']:
-        mask = pd.to_datetime(filtered_df[col_mapping['DeliveryDate']], errors='coerce').between(
-            pd.to_datetime(filters['delivery_date_range'][0]),
-            pd.to_datetime(filters['delivery_date_range'][1])
-        )
-        filtered_df = filtered_df[mask]
+    # Session memakai dataset ini (dipanggil setiap run sebagai heartbeat)
+    def acquire(self, session_id, store_key):
+        with self.lock:
+            self.sessions[session_id] = (store_key, time.time())
     
-    if filters.get('selected_plants') and col_mapping['PlantName']:
-        filtered_df = filtered_df[filtered_df[col_mapping['PlantName']].isin(filters['selected_plants'])]
+    def release(self, session_id):
+        with self.lock:
+            self.sessions.pop(session_id, None)
+            self._evict()
     
-    if filters.get('selected_status') and col_mapping['Status']:
-        filtered_df = filtered_df[filtered_df[col_mapping['Status']].isin(filters['selected_status'])]
+    # Jumlah referensi per key dari session yang masih aktif
+    def _refcounts(self):
+        cutoff = time.time() - self.session_ttl
+        for session_id in [sid for sid, (_, seen) in self.sessions.items() if seen < cutoff]:
+            del self.sessions[session_id]
+        counts = {}
+        for store_key, _ in self.sessions.values():
+            counts[store_key] = counts.get(store_key, 0) + 1
+        return counts
     
-    # Calculate metrics
-    total_orders = len(filtered_df)
+    # Entry keep (yang baru disimpan/diperbesar) tidak di-evict: session pemakainya baru di-pin
+    # lewat acquire di akhir run. Kalau yang tersisa tetap di atas batas, store melebihi budget.
+    def _evict(self, keep=None):
+        refcounts = self._refcounts()
+        total = sum(entry['bytes'] for entry in self.entries.values())
+        for store_key in list(self.entries):
+            if total <= self.max_bytes:
+                break
+            if refcounts.get(store_key) or store_key == keep:
+                continue
+            total -= self.entries.pop(store_key)['bytes']
+            self.load_locks.pop(store_key, None)
     
-    if col_mapping['OrderQty']:
-        total_qty = filtered_df[col_mapping['OrderQty']].sum()
-    else:
-        total_qty = total_orders
-    
-    # Calculate Status KPI (4 separate metrics)
-    if col_mapping['Status']:
-        status_counts = filtered_df[col_mapping['Status']].value_counts()
-        # Get counts for specific statuses
-        pending_count = status_counts.get('Pending', 0) + status_counts.get('Pending Confirmation', 0)
-        on_booking_count = status_counts.get('On Booking', 0) + status_counts.get('Booking', 0)
-        canceled_count = status_counts.get('Canceled', 0) + status_counts.get('Cancelled', 0) + status_counts.get('Cancel', 0)
-        delivered_count = status_counts.get('Delivered', 0)
-    else:
-        pending_count = on_booking_count = canceled_count = delivered_count = 0
+    # Key dataset yang sedang dipakai session aktif
+    def in_use(self):
+        with self.lock:
+            return {store_key[0] for store_key in self._refcounts()}
     
-    # Calculate Order vs Actual Delivery
-    if col_mapping['OrderQty'] and col_mapping['ActualDelivery']:
-        total_order_qty = filtered_df[col_mapping['OrderQty']].sum()
-        total_actual_delivery = filtered_df[col_mapping['ActualDelivery']].sum()
-        delivery_ratio = (total_actual_delivery / total_order_qty * 100) if total_order_qty > 0 else 0
-    else:
-        total_order_qty = 0
-        total_actual_delivery = 0
-        delivery_ratio = 0
+    # Setelah file cache suatu dataset dihapus: entry out-of-core (df None) dibuang karena barisnya
+    # hanya ada di file itu, dan backend SQL yang membaca file tersebut dilepas
+    def release_cache_files(self, dataset_key):
+        with self.lock:
+            for store_key in [key for key in self.entries if key[0] == dataset_key]:
+                entry = self.entries[store_key]
+                if entry['dataset'][0] is None:
+                    del self.entries[store_key]
+                    continue
+                for name in [name for name in entry['derived'] if name.startswith('sql_')]:
+                    entry['bytes'] -= object_nbytes(entry['derived'].pop(name))
+    
+    def usage(self):
+        with self.lock:
+            refcounts = self._refcounts()
+            return {
+                'bytes': sum(entry['bytes'] for entry in self.entries.values()),
+                'datasets': len(self.entries),
+                'pinned': sum(1 for store_key in self.entries if refcounts.get(store_key)),
+                'sessions': len(self.sessions)
+            }
+
+@st.cache_resource
+def get_dataset_store():
+    return DatasetStore(STORE_MAX_BYTES, STORE_SESSION_TTL)
+
+# Fungsi untuk memuat dataset lewat store bersama; hasilnya dibagi tanpa copy ke semua
+# session, jadi jangan dimodifikasi. Mode out-of-core disimpan terpisah karena df-nya None.
+def load_dataset(dataset_key, sources, header_row=0, mode='Standard'):
+    store = get_dataset_store()
+    store_key = (dataset_key, header_row, mode == 'Out-of-core' and pyarrow is not None)
+    dataset = store.get(store_key)
+    if dataset is None:
+        with store.load_lock(store_key):
+            dataset = store.get(store_key)
+            if dataset is None:
+                with st.spinner("Preparing dataset..."):
+                    dataset = read_dataset(dataset_key, sources, header_row, mode)
+                if dataset[2] is not None:
+                    store.put(store_key, dataset)
+    return store_key, dataset
+
+# Konfigurasi warm start: folder yang dimuat di background saat proses server mulai,
+# dan snapshot session (referensi dataset + col_mapping + filter) di cache disk
+PRELOAD_DIR = os.environ.get('ORDER_PRELOAD_DIR', '')
+SNAPSHOT_DIR = os.path.join(CACHE_DIR, 'snapshots')
+
+# Fungsi untuk memuat folder preload ke cache disk dan store bersama. Dijalankan di thread
+# background (tanpa elemen Streamlit); key-nya sama dengan key folder itu sebagai Local Data Folder.
+def preload_dataset(folder, store, status):
+    started = time.perf_counter()
+    try:
+        sources = list_local_sources(folder)
+        if not sources:
+            raise FileNotFoundError(f"No CSV/XLSX/SQLite files in {folder}")
+        dataset_key = combine_source_keys([hash_local_source(source) for source in sources])
+        store_key = (dataset_key, 0, False)
+        status.update(state='loading', dataset_key=dataset_key, source_name=sources_label(sources))
+        with store.load_lock(store_key):
+            if store.get(store_key) is None:
+                dataset = read_cached_dataset(dataset_key)
+                if dataset is None:
+                    df, col_mapping = ingest_sources(sources, 0, PLAN_DIR)
+                    if df is None:
+                        raise ValueError(f"No order data found in {folder}")
+                    cube = build_order_cube(df, col_mapping)
+                    write_cached_dataset(dataset_key, df, col_mapping, sources_label(sources), cube)
+                    dataset = (df, col_mapping, cube)
+                store.put(store_key, dataset)
+        status.update(state='ready', seconds=time.perf_counter() - started)
+    except Exception as e:
+        status.update(state='failed', error=str(e))
+
+# Fungsi untuk memulai preload sekali per proses server (Streamlit tidak punya hook startup,
+# jadi dimulai oleh run script pertama); mengembalikan dict status yang diisi thread preload
+@st.cache_resource
+def start_preload(folder):
+    status = {'state': 'starting', 'folder': folder}
+    threading.Thread(target=preload_dataset, args=(folder, get_dataset_store(), status), name='order-preload', daemon=True).start()
+    return status
+
+# Pasangan key widget form filter -> key state filter
+FILTER_STATE_KEYS = {
+    'filter_create_dates': 'create_date_range',
+    'filter_delivery_dates': 'delivery_date_range',
+    'filter_plants': 'selected_plants',
+    'filter_status': 'selected_status'
+}
+
+# Fungsi untuk path file snapshot dari namanya
+def snapshot_path(name):
+    return os.path.join(SNAPSHOT_DIR, re.sub(r'[^\w.-]+', '_', name.strip()) + '.json')
+
+# Fungsi untuk daftar snapshot tersimpan (terbaru lebih dulu)
+def list_snapshots():
+    if not os.path.isdir(SNAPSHOT_DIR):
+        return []
+    snapshots = []
+    for name in os.listdir(SNAPSHOT_DIR):
+        if name.endswith('.json'):
+            try:
+                with open(os.path.join(SNAPSHOT_DIR, name)) as f:
+                    snapshots.append(dict(json.load(f), path=os.path.join(SNAPSHOT_DIR, name)))
+            except (OSError, ValueError):
+                continue
+    return sorted(snapshots, key=lambda snapshot: snapshot.get('created', 0), reverse=True)
+
+# Fungsi callback untuk menyimpan snapshot session: referensi dataset di cache disk, col_mapping
+# dan state filter. Dataset yang hanya ada di memori (hasil merge delta / live) ditulis dulu ke cache.
+def save_snapshot(source_name):
+    name = st.session_state.get('snapshot_name', '').strip()
+    dataset = get_dataset_store().get(st.session_state.store_key)
+    if not name or dataset is None:
+        return
+    df, col_mapping, cube = dataset
+    dataset_key, header_row, out_of_core = st.session_state.store_key
+    if not os.path.exists(cache_paths(dataset_key)[1]) and df is not None:
+        write_cached_dataset(dataset_key, df, col_mapping, source_name, cube)
+    filters = {
+        key: [value.isoformat() for value in values] if key.endswith('_date_range') and values else values
+        for key, values in st.session_state.get('filters', {}).items()
+    }
+    snapshot = {
+        'name': name,
+        'created': time.time(),
+        'store_key': [dataset_key, header_row, out_of_core],
+        'source_name': source_name,
+        'col_mapping': col_mapping,
+        'filters': filters
+    }
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    path = snapshot_path(name)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(snapshot, f, default=str)
+    os.replace(path + '.tmp', path)
+    st.session_state.snapshot_name = ''
+
+# Fungsi callback untuk memulihkan snapshot: dataset diambil lewat key-nya, widget filter diisi ulang
+def restore_snapshot(path):
+    with open(path) as f:
+        snapshot = json.load(f)
+    filters = {
+        key: tuple(datetime.fromisoformat(value).date() for value in values) if key.endswith('_date_range') and values else values
+        for key, values in snapshot['filters'].items()
+    }
+    st.session_state.restored_snapshot = snapshot
+    st.session_state.filters = filters
+    for widget_key, filter_key in FILTER_STATE_KEYS.items():
+        if filters.get(filter_key) is not None:
+            st.session_state[widget_key] = filters[filter_key]
+        else:
+            st.session_state.pop(widget_key, None)
+    st.session_state.filter_source = snapshot['store_key'][0]
+    st.session_state.pop('filter_domains', None)
+    st.session_state.pop('comparison_range', None)
+    st.session_state.pop('merged_dataset', None)
+
+# Fungsi callback untuk menutup snapshot (kembali ke sumber yang dipilih di sidebar)
+def close_snapshot():
+    st.session_state.pop('restored_snapshot', None)
+
+# Fungsi untuk memuat dataset snapshot: dari store bersama, atau dari cache disk (memory-mapped)
+# dengan col_mapping dari snapshot, tanpa parsing ulang dan tanpa deteksi kolom
+def load_snapshot_dataset(snapshot):
+    dataset_key, header_row, out_of_core = snapshot['store_key']
+    store = get_dataset_store()
+    store_key = (dataset_key, header_row, out_of_core)
+    dataset = store.get(store_key)
+    if dataset is None:
+        with store.load_lock(store_key):
+            dataset = store.get(store_key)
+            if dataset is None:
+                cached = read_cached_dataset(dataset_key, load_rows=not out_of_core)
+                if cached is None:
+                    return store_key, (None, {}, None)
+                dataset = (cached[0], snapshot['col_mapping'], cached[2])
+                store.put(store_key, dataset)
+    return store_key, dataset
+
+# Fungsi untuk index OrderID per dataset (dipakai upsert delta)
+def get_order_index(store_key, df, order_col):
+    return get_dataset_store().derived(store_key, 'order_index', lambda: pd.Index(order_keys(df[order_col])))
+
+# Fungsi untuk struktur turunan dataset baru yang diperbarui inkremental dari dataset dasar
+# (sketch fill rate, sebanding ukuran delta). Yang lain, seperti rollup site, dibangun saat dibutuhkan.
+def carry_derived(store_key, replaced_rows, added_rows, col_mapping):
+    previous = get_dataset_store().peek_derived(store_key, 'fill_sketch')
+    if previous is None or previous[0] is None:
+        return {}
+    sketch = update_fill_sketch(previous[0], replaced_rows, added_rows, col_mapping)
+    return {'fill_sketch': (sketch, FilterEngine(sketch, cube_col_mapping(sketch)))}
+
+# Fungsi untuk upsert frame delta ke dataset (baris + cube + sketch). Mengembalikan (dataset baru,
+# struktur turunan, jumlah order yang diperbarui, jumlah order baru); dataset dasar tidak diubah.
+def upsert_dataset(store_key, dataset, delta_df, delta_mapping):
+    df, col_mapping, cube = dataset
+    order_index = get_order_index(store_key, df, col_mapping['OrderID'])
+    merged_df, replaced_rows, added_rows = upsert_orders(df, delta_df, col_mapping, delta_mapping, order_index)
+    merged_cube = update_order_cube(cube, replaced_rows, added_rows, col_mapping)
+    derived = carry_derived(store_key, replaced_rows, added_rows, col_mapping)
+    return (merged_df, col_mapping, merged_cube), derived, len(replaced_rows), len(added_rows) - len(replaced_rows)
+
+# Fungsi untuk menambahkan baris baru ke dataset (baris + cube + sketch). Mengembalikan
+# (dataset baru, struktur turunan, jumlah baris baru); dataset dasar tidak diubah.
+def append_dataset(store_key, dataset, delta_df):
+    df, col_mapping, cube = dataset
+    merged_df, added_rows = append_orders(df, delta_df, col_mapping, col_mapping)
+    merged_cube = update_order_cube(cube, df.iloc[:0], added_rows, col_mapping)
+    derived = carry_derived(store_key, df.iloc[:0], added_rows, col_mapping)
+    return (merged_df, col_mapping, merged_cube), derived, len(added_rows)
+
+# Fungsi untuk merge file delta ke dataset aktif (upsert berdasarkan OrderID).
+# Hasilnya dataset baru di store bersama.
+def merge_delta(store_key, dataset, delta_file, header_row=0):
+    delta_df, delta_mapping = ingest_sources([(delta_file.name, delta_file.getvalue())], header_row, PLAN_DIR)
+    if delta_df is None or not delta_mapping.get('OrderID'):
+        raise ValueError("Delta file has no Order ID column")
+    merged, derived, updated, inserted = upsert_dataset(store_key, dataset, delta_df, delta_mapping)
+    merged_key = hashlib.sha256(f"{store_key[0]}+{get_dataset_key(delta_file, header_row)}".encode('utf-8')).hexdigest()
+    store_key = (f"{merged_key}:{header_row}", header_row, False)
+    get_dataset_store().put(store_key, merged, derived)
+    return store_key, updated, inserted
+
+# Konfigurasi mode live (polling sumber lokal)
+LIVE_INTERVAL_SECONDS = int(os.environ.get('ORDER_LIVE_INTERVAL_SECONDS', '30'))
+
+# Fungsi untuk versi tiap sumber lokal (key isi dan ukuran file), dasar refresh inkremental
+def live_file_versions(sources, header_row=0):
+    return {source: {'key': get_path_key(source, header_row), 'size': os.path.getsize(source)} for source in sources}
+
+# Fungsi untuk refresh inkremental pada mode live: kalau sumber lokal hanya bertambah di akhir
+# (CSV yang di-append, baris SQLite dengan rowid baru), dataset versi baru dibuat dari versi
+# sebelumnya + baris baru lalu disimpan di store dengan key isi yang baru, sehingga load_dataset
+# tidak membaca ulang semuanya. Hasilnya harus sama dengan load penuh, jadi perubahan lain
+# (baris diubah/dihapus, file baru/hilang, Excel, out-of-core) tetap memakai load penuh.
+def refresh_live_dataset(dataset_key, sources, header_row=0):
+    live = st.session_state.get('live_state')
+    store = get_dataset_store()
+    store_key = (dataset_key, header_row, False)
+    if live is None or live['dataset_key'] == dataset_key or store.get(store_key) is not None:
+        return
+    previous = store.get(live['store_key'])
+    if previous is None or previous[0] is None or set(live['files']) != set(sources):
+        return
+    keys = {source: get_path_key(source, header_row) for source in sources}
+    if combine_source_keys([keys[source] for source in sources], header_row) != dataset_key:
+        return
+    delta_sources = []
+    for source in sources:
+        known = live['files'][source]
+        if known['key'] == keys[source]:
+            continue
+        if source.endswith(SQLITE_EXTENSIONS):
+            delta_sources.append(source)
+        elif source.endswith('.csv'):
+            appended = read_appended_csv(source, known['key'].split(':')[0], known['size'], keys[source].split(':')[0], header_row)
+            if appended is None:
+                return
+            delta_sources.append(appended)
+        else:
+            return
+    
+    df, col_mapping, cube = previous
+    try:
+        with stage('live_delta_read') as record:
+            delta_df, watermarks = ingest_delta(delta_sources, col_mapping, df.columns, live['watermarks'], header_row, PLAN_DIR)
+            record['rows_out'] = len(delta_df) if delta_df is not None else 0
+    except Exception:
+        return
+    # Database SQLite dibaca langsung: isinya tidak boleh berubah sejak key dihitung
+    if delta_df is None or any(hash_local_source(source, header_row) != keys[source] for source in delta_sources if isinstance(source, str)):
+        return
+    with stage('live_append', len(delta_df)) as record:
+        merged, derived, inserted = append_dataset(live['store_key'], previous, delta_df)
+        record['rows_out'] = len(merged[0])
+    store.put(store_key, merged, derived)
+    st.session_state.live_state = {
+        'dataset_key': dataset_key,
+        'store_key': store_key,
+        'files': live_file_versions(sources, header_row),
+        'watermarks': watermarks
+    }
+    st.session_state.live_summary = f"Δ {inserted:,} new rows"
+
+# Fungsi untuk mencatat versi sumber lokal yang sedang ditampilkan (dasar refresh berikutnya).
+# Watermark diambil sebelum key isi; kalau isi sudah berubah lagi, state tidak dicatat.
+def record_live_state(dataset_key, store_key, sources, header_row=0):
+    live = st.session_state.get('live_state')
+    if live and live['dataset_key'] == dataset_key:
+        return
+    st.session_state.pop('live_state', None)
+    st.session_state.pop('live_summary', None)
+    watermarks = {source: sqlite_watermarks(source) for source in sources if source.endswith(SQLITE_EXTENSIONS)}
+    files = live_file_versions(sources, header_row)
+    if combine_source_keys([files[source]['key'] for source in sources], header_row) != dataset_key:
+        return
+    st.session_state.live_state = {
+        'dataset_key': dataset_key,
+        'store_key': store_key,
+        'files': files,
+        'watermarks': watermarks
+    }
+
+# Fungsi polling mode live (dijalankan sebagai fragment dengan run_every). Kalau tidak ada
+# perubahan, biayanya hanya os.stat per file; kalau isi berubah, seluruh app di-rerun.
+@tracked_run('live_monitor')
+def live_monitor(data_folder, dataset_key):
+    sources = list_local_sources(data_folder)
+    if sources and get_sources_key(sources) != dataset_key:
+        st.rerun()
+    st.caption(f"📡 Live • checked {datetime.now():%H:%M:%S}")
+
+# Konfigurasi tabel detail (paginasi di server, hanya satu halaman yang dikirim ke browser)
+TABLE_PAGE_SIZES = [25, 50, 100, 250, 500]
+TABLE_SEARCH_FIELDS = ['OrderID', 'SiteName']
+DETAIL_FIELDS = ['OrderID', 'SiteNo', 'SiteName', 'DeliveryDate', 'PlantName', 'OrderQty', 'ActualDelivery', 'Status', 'CreateDate']
+
+# Fungsi untuk urutan baris tabel (search lalu sort) di atas selection filter engine.
+# Selection sudah terurut berdasarkan CreateDate, jadi urutan default tidak perlu sort.
+def table_row_order(df, selection, col_mapping, search, sort_column, ascending):
+    positions = selection
+    if search:
+        hits = np.zeros(len(positions), dtype=bool)
+        for field in TABLE_SEARCH_FIELDS:
+            col = col_mapping.get(field)
+            if col:
+                values = df[col].take(positions).astype(str)
+                hits |= values.str.contains(search, case=False, regex=False, na=False).to_numpy()
+        positions = positions[hits]
+    if sort_column and not (sort_column == col_mapping.get('CreateDate') and ascending):
+        values = df[sort_column].take(positions)
+        positions = values.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+    return positions
+
+# Fungsi untuk urutan tabel yang di-cache di session (ganti halaman tidak mengulang sort)
+def get_table_row_order(dataset_key, df, selection, col_mapping, filters, search, sort_column, ascending):
+    state_key = (dataset_key, repr(sorted(filters.items())), search, sort_column, ascending)
+    cached = st.session_state.get('table_order')
+    if cached is None or cached[0] != state_key:
+        cached = (state_key, table_row_order(df, selection, col_mapping, search, sort_column, ascending))
+        st.session_state.table_order = cached
+    return cached[1]
+
+# Konfigurasi export (dibuat hanya saat tombol download diklik, di-cache di disk)
+EXPORT_DIR = os.path.join(CACHE_DIR, 'exports')
+EXPORT_CACHE_ENTRIES = 8
+
+# Fungsi untuk path file export per (dataset, state filter, kolom, format)
+def export_path(dataset_key, filters, columns, export_format):
+    payload = repr((dataset_key, sorted(filters.items()), list(columns), export_format))
+    digest = hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+    return os.path.join(EXPORT_DIR, f"{digest}.{EXPORT_FORMATS[export_format][0]}")
+
+# Fungsi untuk membuat (atau memakai ulang) file export lalu mengembalikan isinya.
+# Dipanggil oleh download_button saat diklik, jadi tidak boleh memanggil elemen Streamlit.
+def build_export(path, make_chunks, export_format, columns):
+    if not os.path.exists(path):
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        write_export(make_chunks(), path, export_format, columns)
+        exports = sorted((os.path.join(EXPORT_DIR, name) for name in os.listdir(EXPORT_DIR)), key=os.path.getmtime)
+        for old_path in exports[:-EXPORT_CACHE_ENTRIES]:
+            os.remove(old_path)
+    with open(path, 'rb') as f:
+        return f.read()
+
+# Fungsi untuk iterator chunk baris terpilih dari frame di memori
+def iter_selected_rows(df, selection, columns, chunk_rows=EXPORT_CHUNK_ROWS):
+    for start in range(0, len(selection), chunk_rows):
+        yield df.iloc[selection[start:start + chunk_rows]][columns]
+
+# Konfigurasi cache figure
+FIGURE_CACHE_ENTRIES = int(os.environ.get('ORDER_FIGURE_CACHE_ENTRIES', '32'))
+
+# Fungsi untuk membuat keempat figure dashboard, di-cache (LRU) per (dataset, state filter).
+# Kalau cache miss, figure yang saling independen dibuat paralel di thread pool.
+@st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def get_dashboard_figures(dataset_key, filter_state, _filtered_cube, _status_counts, _totals, _col_mapping, _baseline_cube=None, _baseline_offset=None):
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = {
+            'status': executor.submit(build_status_figure, _status_counts, _col_mapping),
+            'delivery': executor.submit(build_delivery_figure, *_totals),
+            'trend': executor.submit(build_trend_figure, _filtered_cube, _col_mapping, _baseline_cube, _baseline_offset),
+            'plant': executor.submit(build_plant_figure, _filtered_cube, _col_mapping)
+        }
+        return {name: future.result() for name, future in futures.items()}
+
+# Konfigurasi form filter
+FILTER_WIDGET_KEYS = ['filter_create_dates', 'filter_delivery_dates', 'filter_plants', 'filter_status', 'comparison_range']
+
+# Fungsi callback untuk tombol Select All / Clear All di form filter
+def set_filter_selection(key, values):
+    st.session_state[key] = values
+
+# Fungsi untuk membawa range tanggal terpilih ke versi baru dataset dari sumber yang sama (refresh
+# live, merge delta): range yang mencakup seluruh versi sebelumnya ikut mencakup seluruh versi baru,
+# range lain dipotong ke batas baru
+def carry_date_selection(key, min_date, max_date):
+    domains = st.session_state.setdefault('filter_domains', {})
+    domain = [pd.Timestamp(min_date).date(), pd.Timestamp(max_date).date()]
+    if key in st.session_state and domains.get(key) not in (None, domain):
+        selected = [pd.Timestamp(value).date() for value in st.session_state[key]]
+        st.session_state[key] = domain if selected == domains[key] else [min(max(value, domain[0]), domain[1]) for value in selected]
+    domains[key] = domain
+    st.session_state.setdefault(key, domain)
+
+# Fungsi untuk membawa pilihan plant/status ke versi baru dataset dari sumber yang sama: pilihan
+# semua opsi ikut mencakup opsi baru, pilihan lain dibatasi ke opsi yang masih ada
+def carry_option_selection(key, options):
+    domains = st.session_state.setdefault('filter_domains', {})
+    if key in st.session_state and domains.get(key) not in (None, options):
+        selected = list(st.session_state[key])
+        st.session_state[key] = options if selected == domains[key] else [value for value in selected if value in options]
+    domains[key] = options
+    st.session_state.setdefault(key, options)
+
+# Fungsi untuk panel KPI (fragment: bisa di-rerun sendiri tanpa menjalankan ulang seluruh script).
+# Dengan KPI periode pembanding, setiap kartu menampilkan delta terhadap periode itu.
+@st.fragment
+def render_kpi_panel(kpis, baseline_kpis=None):
+    total_orders, total_qty = kpis['total_orders'], kpis['total_qty']
+    total_order_qty, total_actual_delivery = kpis['order_qty'], kpis['actual_delivery']
+    pending_count, on_booking_count, canceled_count, delivered_count = kpis['status_kpis'].values()
+    def delta(name, label=None):
+        if baseline_kpis is None:
+            return ""
+        if label is not None:
+            return format_delta(kpis['status_kpis'][label], baseline_kpis['status_kpis'][label])
+        return format_delta(kpis[name], baseline_kpis[name])
     
     # Summary Cards - 8 cards total (2 rows of 4)
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.markdown(create_metric_card("TOTAL ORDERS", total_orders, "linear-gradient(135deg, #667eea 0%, #764ba2 100%)"), unsafe_allow_html=True)
+        st.markdown(create_metric_card("TOTAL ORDERS", total_orders, "linear-gradient(135deg, #667eea 0%, #764ba2 100%)", delta=delta('total_orders')), unsafe_allow_html=True)
     
     with col2:
-        st.markdown(create_metric_card("TOTAL QTY", f"{total_qty:.0f}", "linear-gradient(135deg, #4ECDC4 0%, #2C7A7B 100%)"), unsafe_allow_html=True)
+        st.markdown(create_metric_card("TOTAL QTY", f"{total_qty:.0f}", "linear-gradient(135deg, #4ECDC4 0%, #2C7A7B 100%)", delta=delta('total_qty')), unsafe_allow_html=True)
     
     with col3:
-        st.markdown(create_metric_card("ORDER QTY", f"{total_order_qty:.0f}", "linear-gradient(135deg, #45B7D1 0%, #2B6CB0 100%)"), unsafe_allow_html=True)
+        st.markdown(create_metric_card("ORDER QTY", f"{total_order_qty:.0f}", "linear-gradient(135deg, #45B7D1 0%, #2B6CB0 100%)", delta=delta('order_qty')), unsafe_allow_html=True)
     
     with col4:
-        st.markdown(create_metric_card("ACTUAL DELIVERY", f"{total_actual_delivery:.0f}", "linear-gradient(135deg, #68D391 0%, #38A169 100%)"), unsafe_allow_html=True)
+        st.markdown(create_metric_card("ACTUAL DELIVERY", f"{total_actual_delivery:.0f}", "linear-gradient(135deg, #68D391 0%, #38A169 100%)", delta=delta('actual_delivery')), unsafe_allow_html=True)
     
     # Status KPI Cards - 4 separate cards
     col1, col2, col3, col4 = st.columns(4)
@@ -361,7 +1095,7 @@ if st.session_state.df is not None and st.session_state.col_mapping:
         st.markdown(f"""
         <div class="metric-card status-card-pending">
             <p class="metric-value">{pending_count}</p>
-            <p class="metric-label">PENDING</p>
+            <p class="metric-label">PENDING</p>{delta(None, 'PENDING')}
         </div>
         """, unsafe_allow_html=True)
     
@@ -369,7 +1103,7 @@ if st.session_state.df is not None and st.session_state.col_mapping:
         st.markdown(f"""
         <div class="metric-card status-card-booking">
             <p class="metric-value">{on_booking_count}</p>
-            <p class="metric-label">BOOKING</p>
+            <p class="metric-label">BOOKING</p>{delta(None, 'BOOKING')}
         </div>
         """, unsafe_allow_html=True)
     
@@ -377,7 +1111,7 @@ if st.session_state.df is not None and st.session_state.col_mapping:
         st.markdown(f"""
         <div class="metric-card status-card-cancel">
             <p class="metric-value">{canceled_count}</p>
-            <p class="metric-label">CANCEL</p>
+            <p class="metric-label">CANCEL</p>{delta(None, 'CANCEL')}
         </div>
         """, unsafe_allow_html=True)
     
@@ -385,167 +1119,593 @@ if st.session_state.df is not None and st.session_state.col_mapping:
         st.markdown(f"""
         <div class="metric-card status-card-delivered">
             <p class="metric-value">{delivered_count}</p>
-            <p class="metric-label">DELIVERED</p>
+            <p class="metric-label">DELIVERED</p>{delta(None, 'DELIVERED')}
         </div>
         """, unsafe_allow_html=True)
+
+# Fungsi untuk satu baris dua chart (fragment)
+@st.fragment
+@tracked_run('chart_row')
+def render_chart_row(left_figure, right_figure):
+    col1, col2 = st.columns(2)
+    
+    with col1, stage('render_chart'):
+        if left_figure is not None:
+            st.plotly_chart(left_figure, use_container_width=True, use_container_height=True)
     
-    # Charts - langsung tampilkan tanpa section header
+    with col2, stage('render_chart'):
+        if right_figure is not None:
+            st.plotly_chart(right_figure, use_container_width=True, use_container_height=True)
+
+# Konfigurasi drill-down plant -> site -> order
+DRILL_ORDER_ROWS = 500
+DRILL_COLUMN_CONFIG = {
+    'Orders': st.column_config.NumberColumn(format="%d"),
+    'OrderQty': st.column_config.NumberColumn("Order Qty", format="%.0f"),
+    'ActualDelivery': st.column_config.NumberColumn("Actual Delivery", format="%.0f"),
+    'FillRatio': st.column_config.ProgressColumn("Fill Ratio", format="percent", min_value=0, max_value=1)
+}
+
+# Fungsi untuk total plant/site per state filter (satu bincount atas kode grup, di-cache LRU)
+@st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES)
+def get_site_totals(dataset_key, filter_state, _rollups, _selection):
+    return _rollups.totals(_selection)
+
+# Fungsi untuk baris chart tren + plant dengan drill-down (fragment: klik bar plant atau baris
+# site hanya menjalankan ulang panel ini). Site per plant dan order per site diambil dari
+# rollup yang sudah dihitung, tanpa groupby baru atas frame terfilter.
+@st.fragment
+@tracked_run('plant_drilldown')
+def render_plant_drilldown(trend_figure, plant_figure, df, col_mapping, filters):
+    drill_enabled = df is not None and bool(col_mapping['SiteNo'] or col_mapping['SiteName'])
     col1, col2 = st.columns(2)
     
-    with col1:
-        # Status Order Bar Chart dengan data labels
-        if col_mapping['Status']:
-            status_counts = filtered_df[col_mapping['Status']].value_counts().reset_index()
-            status_counts.columns = ['Status', 'Count']
-            fig1 = px.bar(
-                status_counts,
-                x='Status',
-                y='Count',
-                title='📊 ORDERS BY STATUS',
-                color='Status',
-                color_discrete_sequence=px.colors.qualitative.Set3
-            )
-            # Tambahkan data labels
-            fig1.update_traces(
-                texttemplate='%{y}', 
-                textposition='outside',
-                textfont=dict(size=11, color='white', family='Orbitron')
-            )
-            fig1.update_layout(
-                showlegend=False, 
-                height=300,
-                font=dict(family='Orbitron', size=10),
-                title_font=dict(size=14, color='#00FF88'),
-                margin=dict(t=40, b=20, l=20, r=20)
-            )
-            st.plotly_chart(fig1, use_container_width=True, use_container_height=True)
+    with col1, stage('render_chart'):
+        if trend_figure is not None:
+            st.plotly_chart(trend_figure, use_container_width=True, use_container_height=True)
     
-    with col2:
-        # Order vs Actual Delivery Bar Chart dengan data labels
-        comparison_data = pd.DataFrame({
-            'Type': ['ORDER QTY', 'ACTUAL DELIVERY'],
-            'Value': [total_order_qty, total_actual_delivery]
-        })
+    with col2, stage('render_chart'):
+        if plant_figure is None:
+            return
+        if not drill_enabled:
+            st.plotly_chart(plant_figure, use_container_width=True, use_container_height=True)
+            return
+        event = st.plotly_chart(plant_figure, use_container_width=True, use_container_height=True, on_select="rerun", selection_mode="points", key="plant_chart")
+    
+    points = event.selection.points if event else []
+    if not points:
+        st.caption("🔍 Click a plant bar to drill down into its sites.")
+        return
+    
+    with stage('drilldown', len(df)) as record:
+        rollups = get_site_rollups(st.session_state.store_key, df, col_mapping)
+        selection = get_filter_engine(st.session_state.store_key, df, col_mapping).select(filters)
+        if len(selection) == len(df):
+            totals, selection = rollups.all_totals, None
+        else:
+            totals = get_site_totals(st.session_state.dataset_key, repr(sorted(filters.items())), rollups, selection)
         
-        fig2 = px.bar(
-            comparison_data,
-            x='Type',
-            y='Value',
-            title='📦 ORDER VS ACTUAL DELIVERY',
-            color='Type',
-            color_discrete_sequence=['#4ECDC4', '#00FF88']
-        )
-        # Tambahkan data labels
-        fig2.update_traces(
-            texttemplate='%{y:,.0f}', 
-            textposition='outside',
-            textfont=dict(size=11, color='white', family='Orbitron')
+        # Bar "Others (n)" berisi beberapa plant: pilih plant dari tabel rollup plant
+        plant = str(points[0]['x'])
+        if plant not in rollups.plants:
+            plants = rollups.plant_totals(totals).sort_values('FillRatio', na_position='last')
+            st.markdown(f'<div style="color: #00FF88; margin: 10px 0;">🏭 {plant.upper()}</div>', unsafe_allow_html=True)
+            plant_event = st.dataframe(plants, hide_index=True, use_container_width=True, height=250, column_config=DRILL_COLUMN_CONFIG,
+                                       on_select="rerun", selection_mode="single-row", key=f"drill_plants_{plant}")
+            if not plant_event.selection.rows:
+                st.caption("Select a plant to see its sites.")
+                return
+            plant = plants.iloc[plant_event.selection.rows[0]]['Plant']
+        
+        sites = rollups.plant_sites(totals, plant).sort_values('FillRatio', na_position='last')
+        record['rows_out'] = len(sites)
+        plant_row = rollups.plant_totals(totals).set_index('Plant').reindex([plant]).iloc[0]
+        st.markdown(
+            f'<div style="color: #00FF88; margin: 10px 0;">🏭 {plant} • {len(sites):,} sites • {plant_row["Orders"]:,.0f} orders • '
+            f'fill ratio {plant_row["FillRatio"]:.1%}</div>', unsafe_allow_html=True
         )
-        fig2.update_layout(
-            showlegend=False, 
-            height=300,
-            yaxis_title='VOLUME',
-            font=dict(family='Orbitron', size=10),
-            title_font=dict(size=14, color='#00FF88'),
-            margin=dict(t=40, b=20, l=20, r=20)
+        site_event = st.dataframe(sites.drop(columns='Plant'), hide_index=True, use_container_width=True, height=250, column_config=DRILL_COLUMN_CONFIG,
+                                  on_select="rerun", selection_mode="single-row", key=f"drill_sites_{plant}")
+        if not site_event.selection.rows:
+            st.caption("Sites are sorted by fill ratio (lowest first). Select a site to see its orders.")
+            return
+        
+        group = sites.index[site_event.selection.rows[0]]
+        rows = rollups.site_rows(group, selection)
+        site_label = ' • '.join(str(sites.loc[group, col]) for col in rollups.site_columns)
+        display_columns = [col_mapping[field] for field in DETAIL_FIELDS if col_mapping[field]]
+        st.markdown(f'<div style="color: #00FF88; margin: 10px 0;">📍 {site_label} • {len(rows):,} orders</div>', unsafe_allow_html=True)
+        st.dataframe(df.iloc[rows[:DRILL_ORDER_ROWS]][display_columns], hide_index=True, use_container_width=True, height=250)
+        if len(rows) > DRILL_ORDER_ROWS:
+            st.caption(f"Showing the first {DRILL_ORDER_ROWS:,} of {len(rows):,} orders; use the detail table search for the rest.")
+
+# Fungsi untuk figure distribusi lead time dan fill rate, di-cache per (dataset, state filter)
+@st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES)
+def get_distribution_figures(dataset_key, filter_state, _lead_time, _fill_rate):
+    return build_lead_time_figure(_lead_time), build_fill_rate_figure(_fill_rate)
+
+# Fungsi untuk panel lead time & fill rate (fragment). Lead time diambil dari cube terfilter
+# (setiap grup cube punya satu lead time), fill rate dari gabungan sketch grup yang lolos filter.
+@st.fragment
+@tracked_run('distributions')
+def render_distribution_panel(filtered_cube, df, col_mapping, filters):
+    with stage('distributions', len(filtered_cube)) as record:
+        lead_time = lead_time_distribution(filtered_cube)
+        fill_rate = None
+        if df is not None:
+            sketch, engine = get_fill_sketch(st.session_state.store_key, df, col_mapping)
+            if sketch is not None:
+                fill_sketch = sketch.iloc[engine.select(filters)]
+                record['rows_in'] = len(fill_sketch)
+                fill_rate = fill_rate_distribution(fill_sketch)
+        if lead_time is None and fill_rate is None:
+            return
+        lead_figure, fill_figure = get_distribution_figures(
+            st.session_state.dataset_key, repr(sorted(filters.items())), _lead_time=lead_time, _fill_rate=fill_rate
         )
-        st.plotly_chart(fig2, use_container_width=True, use_container_height=True)
     
-    col1, col2 = st.columns(2)
+    def format_days(value):
+        return f"{value:,.0f} d" if pd.notna(value) else "-"
+    def format_rate(value):
+        return f"{value:.0%}" if pd.notna(value) else "-"
     
+    col1, col2, col3, col4 = st.columns(4)
+    lead_quantiles = lead_time['quantiles'] if lead_time else {}
     with col1:
-        # Order Trend Line Chart dengan data labels
-        if col_mapping['CreateDate']:
-            try:
-                filtered_df['CreateDate_parsed'] = pd.to_datetime(filtered_df[col_mapping['CreateDate']], errors='coerce')
-                daily_orders = filtered_df.groupby(filtered_df['CreateDate_parsed'].dt.date).size().reset_index()
-                daily_orders.columns = ['Date', 'Orders']
-                fig3 = px.line(
-                    daily_orders,
-                    x='Date',
-                    y='Orders',
-                    title='📈 DAILY ORDER TREND',
-                    markers=True
-                )
-                # Tambahkan data labels
-                fig3.update_traces(
-                    texttemplate='%{y}',
-                    textposition='top center',
-                    textfont=dict(size=9, color='white', family='Orbitron')
-                )
-                fig3.update_layout(
-                    height=300,
-                    font=dict(family='Orbitron', size=10),
-                    title_font=dict(size=14, color='#00FF88'),
-                    margin=dict(t=40, b=20, l=20, r=20)
-                )
-                st.plotly_chart(fig3, use_container_width=True, use_container_height=True)
-            except:
-                pass
-    
+        st.markdown(create_metric_card("LEAD TIME P50", format_days(lead_quantiles.get(0.5)), "linear-gradient(135deg, #0F766E 0%, #115E59 100%)"), unsafe_allow_html=True)
     with col2:
-        # Order Qty vs Actual Delivery by Plant (Grouped Bar Chart)
-        if col_mapping['PlantName'] and col_mapping['OrderQty'] and col_mapping['ActualDelivery']:
-            plant_performance = filtered_df.groupby(col_mapping['PlantName']).agg({
-                col_mapping['OrderQty']: 'sum',
-                col_mapping['ActualDelivery']: 'sum'
-            }).reset_index()
-            
-            plant_performance.columns = ['Plant', 'OrderQty', 'ActualDelivery']
-            
-            # Melt data untuk grouped bar chart
-            melted_data = plant_performance.melt(id_vars='Plant', 
-                                                value_vars=['OrderQty', 'ActualDelivery'],
-                                                var_name='Type', 
-                                                value_name='Value')
-            
-            fig4 = px.bar(
-                melted_data,
-                x='Plant',
-                y='Value',
-                color='Type',
-                barmode='group',
-                title='🏭 ORDER QTY VS ACTUAL DELIVERY BY PLANT',
-                color_discrete_map={'OrderQty': '#4ECDC4', 'ActualDelivery': '#00FF88'}
-            )
-            
-            # Tambahkan data labels
-            fig4.update_traces(
-                texttemplate='%{y:,.0f}',
-                textposition='outside',
-                textfont=dict(size=9, color='white', family='Orbitron')
-            )
-            
-            fig4.update_layout(
-                height=300,
-                xaxis_tickangle=-45,
-                legend_title_text='TYPE',
-                font=dict(family='Orbitron', size=10),
-                title_font=dict(size=14, color='#00FF88'),
-                margin=dict(t=40, b=20, l=20, r=20)
-            )
-            st.plotly_chart(fig4, use_container_width=True, use_container_height=True)
+        st.markdown(create_metric_card("LEAD TIME P90", format_days(lead_quantiles.get(0.9)), "linear-gradient(135deg, #0F766E 0%, #115E59 100%)"), unsafe_allow_html=True)
+    with col3:
+        st.markdown(create_metric_card("LEAD TIME P99", format_days(lead_quantiles.get(0.99)), "linear-gradient(135deg, #0F766E 0%, #115E59 100%)"), unsafe_allow_html=True)
+    with col4:
+        fill_median = fill_rate['quantiles'][0.5] if fill_rate else None
+        st.markdown(create_metric_card("FILL RATE P50", format_rate(fill_median), "linear-gradient(135deg, #0F766E 0%, #115E59 100%)"), unsafe_allow_html=True)
     
-    # Data Table
+    col1, col2 = st.columns(2)
+    with col1, stage('render_chart'):
+        if lead_figure is not None:
+            st.plotly_chart(lead_figure, use_container_width=True, use_container_height=True)
+    with col2, stage('render_chart'):
+        if fill_figure is not None:
+            st.plotly_chart(fill_figure, use_container_width=True, use_container_height=True)
+        elif df is None:
+            st.caption("Fill-rate distribution needs the rows in memory (not available out-of-core).")
+
+# Fungsi untuk tabel detail + export (fragment: search, sort, paging dan format export
+# hanya menjalankan ulang panel ini)
+@st.fragment
+@tracked_run('detail_table')
+def render_detail_table(df, col_mapping, filters, query_backend):
     st.markdown('<div style="color: #00FF88; font-size: 1.2em; margin: 10px 0;">📋 DETAILED ORDER DATA</div>', unsafe_allow_html=True)
     
     # Select columns to display
     display_columns = []
-    for col_key in ['OrderID', 'SiteNo', 'SiteName', 'DeliveryDate', 'PlantName', 'OrderQty', 'ActualDelivery', 'Status', 'CreateDate']:
+    for col_key in DETAIL_FIELDS:
         if col_mapping[col_key]:
             display_columns.append(col_mapping[col_key])
     
     if display_columns:
-        st.dataframe(filtered_df[display_columns], use_container_width=True, height=250)
+        # Kontrol tabel: search, sort dan ukuran halaman
+        col1, col2, col3, col4 = st.columns([3, 2, 1, 1])
+        with col1:
+            search_text = st.text_input("🔎 Search Order ID / Site Name", key="table_search").strip()
+        with col2:
+            default_sort = col_mapping['CreateDate'] if col_mapping['CreateDate'] in display_columns else display_columns[0]
+            sort_column = st.selectbox("Sort By", display_columns, index=display_columns.index(default_sort), key="table_sort")
+        with col3:
+            ascending = st.selectbox("Order", ['Ascending', 'Descending'], key="table_order_dir") == 'Ascending'
+        with col4:
+            page_size = st.selectbox("Rows/Page", TABLE_PAGE_SIZES, index=1, key="table_page_size")
+        search_columns = [col_mapping[field] for field in TABLE_SEARCH_FIELDS if col_mapping[field]]
+        
+        # Apply filters (selection posisi baris dari filter engine; out-of-core lewat backend SQL)
+        with stage('table_filter', len(df) if df is not None else None) as record:
+            if df is not None:
+                engine = get_filter_engine(st.session_state.store_key, df, col_mapping)
+                selection = engine.select(filters)
+                row_order = get_table_row_order(st.session_state.dataset_key, df, selection, col_mapping, filters, search_text, sort_column, ascending)
+                total_rows = len(row_order)
+            else:
+                sql_engine = SQL_BACKENDS[0] if query_backend == 'Pandas' else query_backend
+                sql_backend = get_sql_backend(st.session_state.store_key, sql_engine, df, col_mapping)
+                total_rows = sql_backend.count_rows(filters, search_text, search_columns)
+            record['rows_out'] = total_rows
+        
+        total_pages = max(1, -(-total_rows // page_size))
+        if st.session_state.get('table_page', 1) > total_pages:
+            st.session_state.table_page = total_pages
+        page = st.number_input("Page", min_value=1, max_value=total_pages, step=1, key="table_page")
+        offset = (page - 1) * page_size
+        
+        with stage('table_page', total_rows) as record:
+            if df is not None:
+                page_df = df.iloc[row_order[offset:offset + page_size]][display_columns]
+            else:
+                page_df = sql_backend.query_rows(filters, display_columns, page_size, offset, sort_column, ascending, search_text, search_columns)
+            record['rows_out'] = len(page_df)
+        
+        with stage('table_render', len(page_df)):
+            st.dataframe(page_df, use_container_width=True, height=250, hide_index=True)
+        st.caption(f"Rows {offset + 1 if total_rows else 0:,}–{min(offset + page_size, total_rows):,} of {total_rows:,} • Page {page} of {total_pages}")
         
-        # Download button
-        csv = filtered_df[display_columns].to_csv(index=False)
-        st.download_button(
-            label="📥 Download Filtered Data as CSV",
-            data=csv,
-            file_name="filtered_orders.csv",
-            mime="text/csv"
+        # Download button (export dibuat saat diklik, per chunk)
+        export_formats = [name for name in EXPORT_FORMATS if name != 'Parquet' or pyarrow is not None]
+        col1, col2 = st.columns([1, 3])
+        with col1:
+            export_format = st.selectbox("Export Format", export_formats, key="export_format", label_visibility="collapsed")
+        if df is not None:
+            make_chunks = lambda: iter_selected_rows(df, selection, display_columns)
+            export_rows = len(selection)
+        else:
+            make_chunks = lambda: sql_backend.iter_rows(filters, display_columns, EXPORT_CHUNK_ROWS)
+            export_rows = sql_backend.count_rows(filters)
+        path = export_path(st.session_state.dataset_key, filters, display_columns, export_format)
+        extension, mime = EXPORT_FORMATS[export_format]
+        with col2:
+            # Excel hanya muat 1.048.575 baris per sheet: export yang lebih besar ditolak, bukan dipotong
+            if export_format == 'Excel' and export_rows > EXCEL_MAX_ROWS:
+                st.warning(f"⚠️ {export_rows:,} filtered rows exceed the Excel limit of {EXCEL_MAX_ROWS:,}. Narrow the filters or export as CSV/Parquet.")
+                return
+            st.download_button(
+                label=f"📥 Download Filtered Data as {export_format}",
+                data=lambda: build_export(path, make_chunks, export_format, display_columns),
+                file_name=f"filtered_orders.{extension}",
+                mime=mime
+            )
+
+# Initialize session state (dan mulai mencatat tahap run ini)
+begin_run('script')
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+if 'store_key' not in st.session_state:
+    st.session_state.store_key = None
+if 'col_mapping' not in st.session_state:
+    st.session_state.col_mapping = {}
+preload_status = start_preload(PRELOAD_DIR) if PRELOAD_DIR else None
+
+# Sidebar
+with st.sidebar:
+    st.markdown("""
+    <div style='text-align: center; padding: 10px 0;'>
+        <h2 style='color: #00FF88; margin: 0; font-size: 1.2em;'>📊 FILTERS</h2>
+    </div>
+    """, unsafe_allow_html=True)
+    st.markdown("---")
+    
+    # Upload File
+    uploaded_files = st.file_uploader("📤 Upload Data File", type=['csv', 'xlsx', 'xls'], accept_multiple_files=True)
+    data_folder = st.text_input("📁 Local Data Folder", value=PRELOAD_DIR, help="Load every CSV/XLSX/SQLite file in this folder, or a single SQLite file, on the dashboard host")
+    sources = list(uploaded_files or []) + list_local_sources(data_folder)
+    
+    # Mode live: polling folder/file SQLite lokal, baris yang ditambahkan di akhir sumber dimuat tanpa load penuh
+    with st.expander("📡 Live Monitoring"):
+        live_mode = st.toggle("Watch local source", key="live_mode", disabled=not data_folder or bool(uploaded_files), help="Needs a Local Data Folder and no uploaded files")
+        live_interval = st.number_input("Poll Interval (seconds)", min_value=5, value=LIVE_INTERVAL_SECONDS, step=5, key="live_interval")
+        st.caption("SQLite tables are followed as append logs: rows with a rowid above the last watermark are appended, and updates to existing orders are not picked up. CSV files that only grew are read from their previous end; any other change triggers a full reload.")
+    live_mode = live_mode and bool(data_folder) and not uploaded_files
+    
+    # Daftar dan purge dataset di cache disk
+    with st.expander("💾 Dataset Cache"):
+        if pyarrow is None:
+            st.caption("Install pyarrow to enable the on-disk dataset cache.")
+        cached_datasets = list_cached_datasets()
+        st.caption(f"{len(cached_datasets)} datasets • {sum(meta.get('bytes', 0) for meta in cached_datasets) / 1024 ** 2:.1f} / {CACHE_MAX_BYTES / 1024 ** 2:.0f} MB")
+        for meta in cached_datasets:
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                st.write(f"• {meta['source_name']} ({meta['rows']:,} rows, {meta['bytes'] / 1024 ** 2:.1f} MB)")
+            with col2:
+                if st.button("🗑️", key=f"purge_{meta['dataset_key']}"):
+                    purge_cached_dataset(meta['dataset_key'])
+                    st.rerun()
+        store_usage = get_dataset_store().usage()
+        st.caption(f"🧠 In memory: {store_usage['datasets']} datasets • {store_usage['bytes'] / 1024 ** 2:.1f} / {STORE_MAX_BYTES / 1024 ** 2:.0f} MB • {store_usage['pinned']} in use by {store_usage['sessions']} sessions")
+        if cached_datasets and st.button("Purge All", key="purge_all_datasets"):
+            for meta in cached_datasets:
+                purge_cached_dataset(meta['dataset_key'])
+            st.rerun()
+        if preload_status is not None:
+            preload_text = {
+                'ready': f"ready in {preload_status.get('seconds', 0):.1f}s",
+                'failed': f"failed: {preload_status.get('error')}"
+            }.get(preload_status['state'], preload_status['state'])
+            st.caption(f"🔥 Preload {preload_status.get('source_name', PRELOAD_DIR)}: {preload_text}")
+    
+    # Snapshot session: simpan/pulihkan dataset + col_mapping + filter tanpa parsing ulang
+    restored = st.session_state.get('restored_snapshot')
+    with st.expander("📸 Snapshots"):
+        source_name = restored['source_name'] if restored else sources_label(sources) if sources else ''
+        st.text_input("Snapshot Name", key="snapshot_name")
+        st.button("Save Snapshot", key="save_snapshot", on_click=save_snapshot, args=(source_name,), disabled=st.session_state.store_key is None)
+        for snapshot in list_snapshots():
+            col1, col2, col3 = st.columns([3, 1, 1])
+            with col1:
+                st.write(f"• {snapshot['name']} ({snapshot['source_name']}, {datetime.fromtimestamp(snapshot['created']):%Y-%m-%d %H:%M})")
+            with col2:
+                st.button("↩️", key=f"restore_{snapshot['path']}", on_click=restore_snapshot, args=(snapshot['path'],), help="Restore")
+            with col3:
+                if st.button("🗑️", key=f"delete_{snapshot['path']}", help="Delete"):
+                    os.remove(snapshot['path'])
+                    st.rerun()
+    
+    # Panel diagnostik (diisi di akhir script, setelah semua tahap run ini selesai)
+    diagnostics_panel = st.expander("⏱️ Diagnostics") if METRICS_PANEL else None
+    
+    ingestion_mode = st.selectbox(
+        "⚙️ Ingestion Mode",
+        INGESTION_MODES,
+        help="Streaming reads large CSV files in chunks; Out-of-core keeps the rows on disk and only the aggregates in memory"
+    )
+    
+    query_backend = st.selectbox(
+        "🗄️ Query Backend",
+        ['Pandas'] + SQL_BACKENDS,
+        help="Run filters and aggregations inside an embedded SQL engine instead of pandas"
+    )
+    
+    if data_folder and not os.path.exists(data_folder):
+        st.warning(f"Folder not found: {data_folder}")
+    
+    # Snapshot yang dipulihkan menggantikan sumber di atas sampai ditutup
+    if restored:
+        live_mode = False
+        st.info(f"📸 Snapshot: {restored['name']}")
+        st.button("Close Snapshot", key="close_snapshot", on_click=close_snapshot)
+    
+    if sources or restored:
+        if restored:
+            dataset_key = restored['store_key'][0]
+            with stage('restore_snapshot') as record:
+                store_key, (df, col_mapping, cube) = load_snapshot_dataset(restored)
+                record['rows_out'] = len(df) if df is not None else None
+            if cube is None:
+                st.error(f"Dataset of snapshot '{restored['name']}' is no longer in the cache.")
+        else:
+            dataset_key = get_sources_key(sources)
+            if ingestion_mode == 'Auto':
+                single_csv_size = None
+                if len(sources) == 1 and sources_label(sources).endswith('.csv'):
+                    single_csv_size = os.path.getsize(sources[0]) if isinstance(sources[0], str) else sources[0].size
+                ingestion_mode = 'Streaming' if single_csv_size and single_csv_size > STREAM_THRESHOLD_BYTES else 'Standard'
+            if ingestion_mode == 'Out-of-core' and pyarrow is None:
+                st.warning("Out-of-core mode needs pyarrow; falling back to streaming.")
+                ingestion_mode = 'Streaming'
+            
+            if live_mode:
+                refresh_live_dataset(dataset_key, sources)
+            with stage('load_dataset') as record:
+                store_key, (df, col_mapping, cube) = load_dataset(dataset_key, sources, mode=ingestion_mode)
+                record['rows_out'] = len(df) if df is not None else None
+            if live_mode and cube is not None:
+                record_live_state(dataset_key, store_key, sources)
+        
+        # Identitas sumber untuk state filter: versi baru sumber live yang sama dan dataset hasil
+        # merge delta memakai filter yang sudah dipilih; hanya sumber lain yang me-reset filter
+        filter_source = f"live:{os.path.abspath(data_folder)}" if live_mode else dataset_key
+        
+        # Dataset hasil merge delta menggantikan dataset dasar selama masih ada di store
+        base_store_key = store_key
+        merged = st.session_state.get('merged_dataset')
+        if merged and merged[0] == store_key:
+            merged_dataset = get_dataset_store().get(merged[1])
+            if merged_dataset is not None:
+                store_key, dataset_key = merged[1], merged[1][0]
+                df, col_mapping, cube = merged_dataset
+            else:
+                del st.session_state.merged_dataset
+        
+        if cube is not None:
+            st.session_state.store_key = store_key
+            if st.session_state.get('dataset_key') != dataset_key:
+                st.session_state.last_refresh = datetime.now()
+            st.session_state.dataset_key = dataset_key
+            st.success("✅ Data loaded successfully!")
+            store_usage = get_dataset_store().usage()
+            if store_usage['bytes'] > STORE_MAX_BYTES:
+                st.warning(f"⚠️ Datasets in memory use {store_usage['bytes'] / 1024 ** 2:.1f} MB, above the {STORE_MAX_BYTES / 1024 ** 2:.0f} MB budget (ORDER_MEMORY_BUDGET_MB). Datasets in use stay loaded; others are reloaded from the disk cache when needed.")
+            
+            # Sketch fill rate dan rollup plant -> site untuk drill-down, dihitung sekali per dataset.
+            # Dataset hasil merge delta / refresh live sudah membawa sketch yang diperbarui inkremental;
+            # rollup site-nya (biaya sebanding seluruh baris) baru dibangun saat drill-down pertama.
+            if df is not None and get_dataset_store().peek_derived(store_key, 'fill_sketch') is None:
+                with stage('fill_sketch', len(df)):
+                    get_fill_sketch(store_key, df, col_mapping)
+                if col_mapping['PlantName'] and (col_mapping['SiteNo'] or col_mapping['SiteName']):
+                    with stage('site_rollups', len(df)):
+                        get_site_rollups(store_key, df, col_mapping)
+            if live_mode:
+                st.fragment(live_monitor, run_every=live_interval)(data_folder, dataset_key)
+                if st.session_state.get('live_summary'):
+                    st.caption(st.session_state.live_summary)
+            if df is None:
+                st.caption("💽 Out-of-core: rows stay on disk, KPIs and charts use the aggregates.")
+            
+            # Auto-detect columns
+            st.session_state.col_mapping = col_mapping
+            
+            # Display detected columns
+            st.info("🔍 Detected Columns:")
+            for display_name, actual_col in col_mapping.items():
+                if actual_col:
+                    st.write(f"• {display_name}: `{actual_col}`")
+            
+            # Incremental refresh: upsert file delta berdasarkan OrderID
+            if df is not None and col_mapping['OrderID']:
+                with st.expander("🔁 Append / Update"):
+                    delta_file = st.file_uploader("Delta File", type=['csv', 'xlsx', 'xls'], key="delta_file", help="New or changed orders; rows are matched on Order ID")
+                    if delta_file is not None and st.button("Merge Delta", key="merge_delta"):
+                        try:
+                            merged_store_key, updated, inserted = merge_delta(store_key, (df, col_mapping, cube), delta_file)
+                            st.session_state.merged_dataset = (base_store_key, merged_store_key)
+                            st.session_state.delta_summary = f"✅ Delta merged: {updated:,} updated, {inserted:,} new orders"
+                            st.rerun()
+                        except Exception as e:
+                            st.error(f"Error merging delta: {str(e)}")
+                    if store_key != base_store_key:
+                        if st.session_state.get('delta_summary'):
+                            st.success(st.session_state.delta_summary)
+                        if st.button("Discard Merged Deltas", key="discard_deltas"):
+                            del st.session_state.merged_dataset
+                            st.rerun()
+            
+            st.markdown("---")
+            
+            # Filters (domain filter diambil dari cube, bukan dari baris).
+            # Semua filter ada di satu form, jadi perubahan baru dijalankan saat Apply diklik.
+            if st.session_state.get('filter_source') != filter_source:
+                for key in FILTER_WIDGET_KEYS:
+                    st.session_state.pop(key, None)
+                st.session_state.pop('filter_domains', None)
+                st.session_state.filter_source = filter_source
+            
+            with st.form("filters_form", border=False):
+                if col_mapping['CreateDate']:
+                    min_date = cube['CreateDay'].min()
+                    max_date = cube['CreateDay'].max()
+                    if pd.notna(min_date):
+                        carry_date_selection('filter_create_dates', min_date, max_date)
+                        create_date_range = st.date_input(
+                            "📅 Create Date Range",
+                            min_value=min_date,
+                            max_value=max_date,
+                            key="filter_create_dates"
+                        )
+                
+                if col_mapping['DeliveryDate']:
+                    min_date = cube['DeliveryDay'].min()
+                    max_date = cube['DeliveryDay'].max()
+                    if pd.notna(min_date):
+                        carry_date_selection('filter_delivery_dates', min_date, max_date)
+                        delivery_date_range = st.date_input(
+                            "🚚 Delivery Date Range",
+                            min_value=min_date,
+                            max_value=max_date,
+                            key="filter_delivery_dates"
+                        )
+                
+                if col_mapping['PlantName']:
+                    plant_options = list(cube['Plant'].cat.categories)
+                    carry_option_selection('filter_plants', plant_options)
+                    selected_plants = st.multiselect(
+                        "🏭 Plant Name",
+                        options=plant_options,
+                        help="Select all plants or choose specific ones",
+                        key="filter_plants"
+                    )
+                    
+                    # Add "Select All" functionality
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        st.form_submit_button("Select All Plants", on_click=set_filter_selection, args=('filter_plants', plant_options))
+                    with col2:
+                        st.form_submit_button("Clear All", on_click=set_filter_selection, args=('filter_plants', []), key="clear_all_plants")
+                
+                if col_mapping['Status']:
+                    status_options = list(cube['Status'].cat.categories)
+                    carry_option_selection('filter_status', status_options)
+                    selected_status = st.multiselect(
+                        "📋 Status",
+                        options=status_options,
+                        help="Select all statuses or choose specific ones",
+                        key="filter_status"
+                    )
+                    
+                    # Add "Select All" functionality
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        st.form_submit_button("Select All Status", on_click=set_filter_selection, args=('filter_status', status_options))
+                    with col2:
+                        st.form_submit_button("Clear All", on_click=set_filter_selection, args=('filter_status', []), key="clear_all_status")
+                
+                st.form_submit_button("✅ Apply Filters", type="primary", use_container_width=True)
+            
+            # Store filter values in session state
+            st.session_state.filters = {
+                'create_date_range': create_date_range if 'create_date_range' in locals() else None,
+                'delivery_date_range': delivery_date_range if 'delivery_date_range' in locals() else None,
+                'selected_plants': selected_plants if 'selected_plants' in locals() else None,
+                'selected_status': selected_status if 'selected_status' in locals() else None
+            }
+            
+            # Mode perbandingan: periode pembanding untuk range create date yang aktif
+            if col_mapping['CreateDate'] and pd.notna(cube['CreateDay'].min()):
+                comparison_mode = st.selectbox("🔀 Compare With", ['Off'] + COMPARISON_MODES, key="comparison_mode", help="Show deltas and a baseline trend against another period")
+                if comparison_mode == 'Custom range':
+                    min_date, max_date = cube['CreateDay'].min(), cube['CreateDay'].max()
+                    carry_date_selection('comparison_range', min_date, max_date)
+                    comparison_range = st.date_input("📅 Baseline Create Date Range", min_value=min_date, max_value=max_date, key="comparison_range")
+                st.session_state.comparison = (comparison_mode, comparison_range if comparison_mode == 'Custom range' else None)
+            else:
+                st.session_state.comparison = None
+
+# Main Content - Compact Header
+st.markdown("""
+<div style='text-align: center; padding: 5px 0;'>
+    <h1 style='color: #00FF88; font-size: 1.8em; margin: 0;'>📊 ORDER & DELIVERY DASHBOARD</h1>
+</div>
+""", unsafe_allow_html=True)
+
+st.markdown("---")
+
+# Display data and visualizations
+# Dataset diambil dari store bersama lewat key-nya (session tidak menyimpan salinan sendiri)
+dataset_store = get_dataset_store()
+dataset = dataset_store.get(st.session_state.store_key)
+if dataset is not None:
+    dataset_store.acquire(st.session_state.session_id, st.session_state.store_key)
+else:
+    dataset_store.release(st.session_state.session_id)
+
+if dataset is not None:
+    df, col_mapping, cube = dataset
+    filters = st.session_state.get('filters', {})
+    
+    # Periode pembanding (mode perbandingan aktif dan range create date lengkap)
+    comparison = st.session_state.get('comparison')
+    baseline = baseline_range(filters.get('create_date_range'), *comparison) if comparison and comparison[0] != 'Off' else None
+    query_filters = comparison_filters(filters, baseline) if baseline else filters
+    
+    # Calculate metrics dari cube (biaya sebanding jumlah grup, bukan jumlah baris).
+    # Dengan periode pembanding, kedua periode diambil dalam satu query lalu dipotong per CreateDay.
+    with stage('filter_cube', len(cube)) as record:
+        if query_backend == 'Pandas':
+            cube_engine = get_cube_engine(st.session_state.store_key, cube)
+            filtered_cube = cube.iloc[cube_engine.select(query_filters)]
+        else:
+            sql_backend = get_sql_backend(st.session_state.store_key, query_backend, df, col_mapping)
+            filtered_cube = finalize_order_cube(sql_backend.query_cube(query_filters))
+        baseline_cube = None
+        if baseline:
+            baseline_cube = slice_period(filtered_cube, baseline)
+            filtered_cube = slice_period(filtered_cube, filters['create_date_range'])
+        record['rows_out'] = len(filtered_cube)
+    with stage('kpis', len(filtered_cube)):
+        try:
+            status_kernel = get_status_kernel(STATUS_MAP_PATH, os.path.getmtime(STATUS_MAP_PATH) if os.path.exists(STATUS_MAP_PATH) else None)
+        except ValueError as e:
+            st.error(f"Error in status mapping: {str(e)}")
+            status_kernel = None
+        kpis = compute_kpis(filtered_cube, col_mapping, status_kernel)
+        baseline_kpis = compute_kpis(baseline_cube, col_mapping, status_kernel) if baseline else None
+    if baseline:
+        st.caption(f"🔀 Compared with {baseline[0]:%Y-%m-%d} – {baseline[1]:%Y-%m-%d} ({comparison[0].lower()})")
+    render_kpi_panel(kpis, baseline_kpis)
+    
+    # Charts - langsung tampilkan tanpa section header (figure di-cache per dataset + state filter)
+    with stage('figures', len(filtered_cube)):
+        figures = get_dashboard_figures(
+            st.session_state.dataset_key, repr((sorted(filters.items()), baseline)), _filtered_cube=filtered_cube,
+            _status_counts=kpis['status_counts'], _totals=(kpis['order_qty'], kpis['actual_delivery']), _col_mapping=col_mapping,
+            _baseline_cube=baseline_cube, _baseline_offset=pd.Timestamp(filters['create_date_range'][0]) - baseline[0] if baseline else None
         )
+    render_chart_row(figures['status'], figures['delivery'])
+    render_plant_drilldown(figures['trend'], figures['plant'], df, col_mapping, filters)
+    
+    # Distribusi lead time & fill rate
+    render_distribution_panel(filtered_cube, df, col_mapping, filters)
+    
+    # Data Table
+    render_detail_table(df, col_mapping, filters, query_backend)
 
 else:
     # Placeholder before data upload
@@ -605,6 +1765,36 @@ st.markdown("---")
 st.markdown("""
 <div style='text-align: center; color: #666; padding: 10px 0; font-size: 0.8em;'>
     <p>🚀 Order & Delivery Monitoring System • Powered by Streamlit</p>
-    <p>📅 """ + datetime.now().strftime("%Y-%m-%d %H:%M:%S") + """</p>
+    <p>📅 """ + (f"Last refresh: {st.session_state.last_refresh:%Y-%m-%d %H:%M:%S}" if st.session_state.get('last_refresh') else datetime.now().strftime("%Y-%m-%d %H:%M:%S")) + """</p>
 </div>
 """, unsafe_allow_html=True)
+
+# Diagnostik per tahap: run ini (waktu, baris masuk/keluar, delta RSS) dan rata-rata semua run di proses ini
+stage_metrics = get_stage_metrics()
+script_run = end_run()
+if script_run is not None:
+    stage_metrics.publish(script_run)
+if diagnostics_panel is not None and script_run is not None:
+    with diagnostics_panel:
+        if script_run.stages:
+            st.dataframe(pd.DataFrame([{
+                'Stage': '· ' * record['depth'] + record['stage'],
+                'ms': record['seconds'] * 1000,
+                'Rows In': record['rows_in'],
+                'Rows Out': record['rows_out'],
+                'RSS Δ MB': record['memory_delta'] / 1024 ** 2 if record['memory_delta'] is not None else None
+            } for record in script_run.stages]), hide_index=True, use_container_width=True, column_config={
+                'ms': st.column_config.NumberColumn(format="%.1f"),
+                'RSS Δ MB': st.column_config.NumberColumn(format="%.1f")
+            })
+        memory_text = f" • RSS Δ {script_run.memory_delta / 1024 ** 2:+.1f} MB" if script_run.memory_delta is not None else ""
+        st.caption(f"This run: {script_run.seconds * 1000:,.0f} ms{memory_text}. RSS is process-wide, so other sessions show up in the deltas.")
+        summary = pd.DataFrame(stage_metrics.summary())
+        if len(summary):
+            summary = summary.assign(mean_ms=summary['mean_seconds'] * 1000, last_ms=summary['last_seconds'] * 1000)
+            st.dataframe(
+                summary[['run', 'stage', 'count', 'mean_ms', 'last_ms']].rename(columns={'run': 'Run', 'stage': 'Stage', 'count': 'Count', 'mean_ms': 'Mean ms', 'last_ms': 'Last ms'}),
+                hide_index=True, use_container_width=True,
+                column_config={'Mean ms': st.column_config.NumberColumn(format="%.1f"), 'Last ms': st.column_config.NumberColumn(format="%.1f")}
+            )
+        st.caption(f"Metrics: `{METRICS_FILE or 'off'}` • Log: `{METRICS_LOG or 'off'}`")
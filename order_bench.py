@@ -0,0 +1,194 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+
+from order_charts import build_delivery_figure, build_plant_figure, build_status_figure, build_trend_figure
+from order_core import (
+    DATE_FIELDS, FilterEngine, build_order_cube, compute_kpis, cube_col_mapping, detect_columns, ingest_sources,
+    parse_date_column, write_export
+)
+from order_synth import write_orders
+
+# Benchmark per tahap pipeline dashboard di atas data sintetis; hasil disimpan sebagai JSON lines
+# supaya run antar versi bisa dibandingkan (python order_bench.py compare)
+
+BENCH_DIR = os.path.join(os.environ.get('ORDER_CACHE_DIR', '.order_cache'), 'bench')
+TABLE_PAGE_ROWS = 50
+
+# Fungsi untuk mengukur satu tahap: waktu (detik) dan puncak alokasi memori (MB, kalau diaktifkan).
+# tracemalloc melihat alokasi Python dan numpy, tidak termasuk buffer Arrow.
+def measure(results, stage, func, *args, track_memory=True):
+    if track_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    value = func(*args)
+    elapsed = time.perf_counter() - start
+    peak = None
+    if track_memory:
+        peak = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        tracemalloc.stop()
+    best = results.get(stage)
+    if best is None or elapsed < best['seconds']:
+        results[stage] = {'seconds': round(elapsed, 6), 'peak_mb': round(peak, 2) if peak is not None else None}
+    return value
+
+# Fungsi untuk filter representatif: setengah rentang create date, setengah plant, dua status teratas
+def sample_filters(df, col_mapping):
+    filters = {}
+    if col_mapping.get('CreateDate'):
+        dates = df[col_mapping['CreateDate']].dropna()
+        if len(dates):
+            start, end = dates.quantile(0.25), dates.quantile(0.75)
+            filters['create_date_range'] = (start.date(), end.date())
+    if col_mapping.get('PlantName'):
+        plants = list(df[col_mapping['PlantName']].cat.categories)
+        filters['selected_plants'] = plants[:max(1, len(plants) // 2)]
+    if col_mapping.get('Status'):
+        filters['selected_status'] = list(df[col_mapping['Status']].value_counts().index[:2])
+    return filters
+
+# Fungsi untuk membangun keempat figure dan menserialisasinya ke JSON (yang dikirim ke browser)
+def build_figures(filtered_cube, kpis, col_mapping):
+    figures = [
+        build_status_figure(kpis['status_counts'], col_mapping),
+        build_delivery_figure(kpis['order_qty'], kpis['actual_delivery']),
+        build_trend_figure(filtered_cube, col_mapping),
+        build_plant_figure(filtered_cube, col_mapping)
+    ]
+    return sum(len(figure.to_json()) for figure in figures if figure is not None)
+
+# Fungsi untuk satu halaman tabel detail + export CSV semua baris terfilter
+def serialize_table(df, selection, columns):
+    page = df.iloc[selection[:TABLE_PAGE_ROWS]][columns].to_json(orient='records', date_format='iso')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'export.csv')
+        write_export((df.iloc[selection[start:start + 100000]][columns] for start in range(0, len(selection), 100000)), path, 'CSV', columns)
+        return len(page) + os.path.getsize(path)
+
+# Fungsi untuk menjalankan semua tahap pada satu file
+def run_stages(path, repeat=1, track_memory=True):
+    results = {}
+    for _ in range(repeat):
+        df, col_mapping = measure(results, 'ingestion', ingest_sources, [path], track_memory=track_memory)
+        read = pd.read_csv if path.endswith('.csv') else pd.read_excel
+        raw = measure(results, 'raw_read', lambda: read(path, dtype=str), track_memory=track_memory)
+        raw_mapping = measure(results, 'column_detection', detect_columns, raw, track_memory=track_memory)
+        measure(results, 'date_parsing', lambda: [parse_date_column(raw[raw_mapping[field]]) for field in DATE_FIELDS if raw_mapping.get(field)], track_memory=track_memory)
+        del raw
+
+        engine = measure(results, 'filter_index', FilterEngine, df, col_mapping, track_memory=track_memory)
+        filters = sample_filters(df, col_mapping)
+        selection = measure(results, 'filtering', engine.select, filters, track_memory=track_memory)
+
+        cube = measure(results, 'cube_build', build_order_cube, df, col_mapping, track_memory=track_memory)
+        def aggregate():
+            filtered_cube = cube.iloc[FilterEngine(cube, cube_col_mapping(cube)).select(filters)]
+            return filtered_cube, compute_kpis(filtered_cube, col_mapping)
+        filtered_cube, kpis = measure(results, 'kpi_aggregation', aggregate, track_memory=track_memory)
+        measure(results, 'figure_construction', build_figures, filtered_cube, kpis, col_mapping, track_memory=track_memory)
+        columns = [col for col in col_mapping.values() if col]
+        measure(results, 'table_serialization', serialize_table, df, selection, columns, track_memory=track_memory)
+    return results, len(df), len(selection)
+
+# Fungsi untuk versi kode yang sedang diukur (commit git kalau ada)
+def code_version():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+# Fungsi untuk membaca hasil benchmark yang tersimpan
+def load_results(results_path):
+    if not os.path.exists(results_path):
+        return []
+    with open(results_path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+# Fungsi untuk membandingkan run terakhir dengan run sebelumnya pada dataset yang sama
+def compare_runs(records):
+    if not records:
+        return "No benchmark results yet."
+    latest = records[-1]
+    previous = next((record for record in reversed(records[:-1]) if record['dataset'] == latest['dataset']), None)
+    if previous is None:
+        return f"No earlier run on dataset {latest['dataset']} to compare with."
+    lines = [f"{latest['dataset']}: {previous['version']} ({previous['timestamp']}) -> {latest['version']} ({latest['timestamp']})",
+             f"{'stage':<22}{'before s':>12}{'after s':>12}{'ratio':>8}{'before MB':>12}{'after MB':>12}"]
+    for stage, after in latest['stages'].items():
+        before = previous['stages'].get(stage)
+        if before is None:
+            continue
+        ratio = after['seconds'] / before['seconds'] if before['seconds'] else float('nan')
+        memory = [f"{result['peak_mb']:>12.1f}" if result['peak_mb'] is not None else f"{'-':>12}" for result in (before, after)]
+        lines.append(f"{stage:<22}{before['seconds']:>12.4f}{after['seconds']:>12.4f}{ratio:>8.2f}{''.join(memory)}")
+    return '\n'.join(lines)
+
+# Fungsi untuk argumen command line
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark each stage of the order dashboard pipeline on synthetic data.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    run = commands.add_parser('run', help="Generate data (if missing) and time every stage")
+    run.add_argument('--rows', type=int, nargs='+', default=[10000, 100000], help="Dataset sizes (default: 10000 100000)")
+    run.add_argument('--format', choices=['csv', 'xlsx'], default='csv', help="Export format (default: csv)")
+    run.add_argument('--plants', type=int, default=10, help="Plant cardinality (default: 10)")
+    run.add_argument('--statuses', type=int, default=4, help="Status cardinality (default: 4)")
+    run.add_argument('--dirty', type=float, default=0.0, help="Fraction of rows with dirty values (default: 0)")
+    run.add_argument('--repeat', type=int, default=1, help="Repeat each stage and keep the fastest (default: 1)")
+    run.add_argument('--no-memory', action='store_true', help="Skip tracemalloc (peak memory) for lower overhead")
+    run.add_argument('--data-dir', default=BENCH_DIR, help="Where generated datasets are kept")
+    run.add_argument('--results', default=os.path.join(BENCH_DIR, 'results.jsonl'), help="Results file (JSON lines)")
+    compare = commands.add_parser('compare', help="Compare the latest run with the previous run on the same dataset")
+    compare.add_argument('--results', default=os.path.join(BENCH_DIR, 'results.jsonl'), help="Results file (JSON lines)")
+    return parser.parse_args(argv)
+
+# Entry point command line: python order_bench.py run --rows 10000 1000000, lalu python order_bench.py compare
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == 'compare':
+        print(compare_runs(load_results(args.results)))
+        return 0
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    os.makedirs(os.path.dirname(os.path.abspath(args.results)), exist_ok=True)
+    version = code_version()
+    for n_rows in args.rows:
+        dataset = f"{n_rows}r_{args.plants}p_{args.statuses}s_{args.dirty:g}d.{args.format}"
+        path = os.path.join(args.data_dir, dataset)
+        if not os.path.exists(path):
+            print(f"Generating {dataset}...", file=sys.stderr)
+            write_orders(path, n_rows, n_plants=args.plants, n_statuses=args.statuses, dirty=args.dirty)
+        stages, rows, selected = run_stages(path, args.repeat, not args.no_memory)
+        record = {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'version': version,
+            'dataset': dataset,
+            'rows': rows,
+            'selected_rows': selected,
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            'stages': stages
+        }
+        with open(args.results, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+        print(f"\n{dataset}: {rows:,} rows, {selected:,} selected, max RSS {record['max_rss_mb']:,.0f} MB")
+        for stage, result in stages.items():
+            memory = f"{result['peak_mb']:>10.1f} MB" if result['peak_mb'] is not None else ''
+            print(f"  {stage:<22}{result['seconds']:>10.4f} s{memory}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
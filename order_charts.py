@@ -0,0 +1,253 @@
+import os
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from order_core import plant_performance
+
+# Modul pembuat figure Plotly dashboard (tanpa Streamlit), dipakai Order.py dan benchmark
+
+# Konfigurasi chart (ukuran payload figure dibatasi)
+TREND_MAX_POINTS = int(os.environ.get('ORDER_TREND_MAX_POINTS', '120'))
+TREND_LABEL_POINTS = 45
+TREND_WEBGL_POINTS = 60
+PLANT_TOP_N = int(os.environ.get('ORDER_PLANT_TOP_N', '15'))
+LEAD_TIME_MAX_DAYS = int(os.environ.get('ORDER_LEAD_TIME_MAX_DAYS', '60'))
+TREND_FREQUENCIES = [('D', 'DAILY'), ('W-MON', 'WEEKLY'), ('MS', 'MONTHLY'), ('QS', 'QUARTERLY'), ('YS', 'YEARLY')]
+
+# Fungsi untuk resample tren order: pilih granularitas terkecil yang jumlah titiknya <= TREND_MAX_POINTS
+# (atau pakai granularitas yang diberikan, misalnya supaya seri pembanding sejajar dengan seri utama)
+def resample_order_trend(cube, granularity=None):
+    daily = cube.groupby('CreateDay')['Orders'].sum()
+    if daily.empty:
+        return pd.DataFrame({'Date': [], 'Orders': []}), granularity or 'DAILY'
+    span_days = (daily.index.max() - daily.index.min()).days + 1
+    for freq, label in TREND_FREQUENCIES:
+        if granularity is not None and label != granularity:
+            continue
+        if freq == 'D' and (granularity is not None or span_days <= TREND_MAX_POINTS):
+            trend = daily
+            break
+        if freq != 'D':
+            trend = daily.resample(freq, label='left', closed='left').sum()
+            if granularity is not None or len(trend) <= TREND_MAX_POINTS:
+                break
+    trend = trend.reset_index()
+    trend.columns = ['Date', 'Orders']
+    return trend, label
+
+# Fungsi untuk membatasi plant chart ke top-N plant (berdasarkan OrderQty) + satu bar "Others"
+def top_plants(plant_performance, top_n=PLANT_TOP_N):
+    if len(plant_performance) <= top_n:
+        return plant_performance
+    ranked = plant_performance.sort_values('OrderQty', ascending=False)
+    others = ranked.iloc[top_n - 1:][['OrderQty', 'ActualDelivery']].sum()
+    others_row = pd.DataFrame({'Plant': [f"Others ({len(ranked) - top_n + 1})"], 'OrderQty': [others['OrderQty']], 'ActualDelivery': [others['ActualDelivery']]})
+    return pd.concat([ranked.iloc[:top_n - 1], others_row], ignore_index=True)
+
+# Fungsi untuk membuat bar chart status order dengan data labels
+def build_status_figure(status_counts, col_mapping):
+    if not col_mapping['Status']:
+        return None
+    status_chart_data = status_counts.reset_index()
+    status_chart_data.columns = ['Status', 'Count']
+    fig1 = px.bar(
+        status_chart_data,
+        x='Status',
+        y='Count',
+        title='📊 ORDERS BY STATUS',
+        color='Status',
+        color_discrete_sequence=px.colors.qualitative.Set3
+    )
+    # Tambahkan data labels
+    fig1.update_traces(
+        texttemplate='%{y}', 
+        textposition='outside',
+        textfont=dict(size=11, color='white', family='Orbitron')
+    )
+    fig1.update_layout(
+        showlegend=False, 
+        height=300,
+        font=dict(family='Orbitron', size=10),
+        title_font=dict(size=14, color='#00FF88'),
+        margin=dict(t=40, b=20, l=20, r=20)
+    )
+    return fig1
+
+# Fungsi untuk membuat bar chart order qty vs actual delivery dengan data labels
+def build_delivery_figure(total_order_qty, total_actual_delivery):
+    comparison_data = pd.DataFrame({
+        'Type': ['ORDER QTY', 'ACTUAL DELIVERY'],
+        'Value': [total_order_qty, total_actual_delivery]
+    })
+    
+    fig2 = px.bar(
+        comparison_data,
+        x='Type',
+        y='Value',
+        title='📦 ORDER VS ACTUAL DELIVERY',
+        color='Type',
+        color_discrete_sequence=['#4ECDC4', '#00FF88']
+    )
+    # Tambahkan data labels
+    fig2.update_traces(
+        texttemplate='%{y:,.0f}', 
+        textposition='outside',
+        textfont=dict(size=11, color='white', family='Orbitron')
+    )
+    fig2.update_layout(
+        showlegend=False, 
+        height=300,
+        yaxis_title='VOLUME',
+        font=dict(family='Orbitron', size=10),
+        title_font=dict(size=14, color='#00FF88'),
+        margin=dict(t=40, b=20, l=20, r=20)
+    )
+    return fig2
+
+# Fungsi untuk membuat line chart tren order (di-resample) dengan data labels
+def build_trend_figure(filtered_cube, col_mapping, baseline_cube=None, baseline_offset=None):
+    if not col_mapping['CreateDate']:
+        return None
+    try:
+        daily_orders, granularity = resample_order_trend(filtered_cube)
+        fig3 = px.line(
+            daily_orders,
+            x='Date',
+            y='Orders',
+            title=f'📈 {granularity} ORDER TREND',
+            markers=len(daily_orders) <= TREND_LABEL_POINTS,
+            render_mode='webgl' if len(daily_orders) > TREND_WEBGL_POINTS else 'svg'
+        )
+        # Tambahkan data labels (hanya kalau titiknya sedikit)
+        if len(daily_orders) <= TREND_LABEL_POINTS:
+            fig3.update_traces(
+                texttemplate='%{y}',
+                textposition='top center',
+                textfont=dict(size=9, color='white', family='Orbitron')
+            )
+        # Seri periode pembanding, digeser ke sumbu waktu periode saat ini
+        if baseline_cube is not None:
+            shifted = baseline_cube.assign(CreateDay=baseline_cube['CreateDay'] + baseline_offset)
+            baseline_orders, _ = resample_order_trend(shifted, granularity)
+            fig3.add_scatter(
+                x=baseline_orders['Date'],
+                y=baseline_orders['Orders'],
+                customdata=baseline_orders['Date'] - baseline_offset,
+                name='Baseline',
+                mode='lines',
+                line=dict(dash='dot', color='#A0AEC0'),
+                hovertemplate='%{customdata|%Y-%m-%d}: %{y}<extra>Baseline</extra>'
+            )
+            fig3.data[0].name = 'Current'
+            fig3.data[0].showlegend = True
+            fig3.update_layout(legend=dict(orientation='h', y=1.02, x=1, xanchor='right', yanchor='bottom', title_text=''))
+        fig3.update_layout(
+            height=300,
+            font=dict(family='Orbitron', size=10),
+            title_font=dict(size=14, color='#00FF88'),
+            margin=dict(t=40, b=20, l=20, r=20)
+        )
+        return fig3
+    except:
+        return None
+
+# Fungsi untuk membuat grouped bar chart order qty vs actual delivery per plant
+def build_plant_figure(filtered_cube, col_mapping):
+    if not (col_mapping['PlantName'] and col_mapping['OrderQty'] and col_mapping['ActualDelivery']):
+        return None
+    performance = top_plants(plant_performance(filtered_cube))
+    
+    # Melt data untuk grouped bar chart
+    melted_data = performance.melt(id_vars='Plant', 
+                                        value_vars=['OrderQty', 'ActualDelivery'],
+                                        var_name='Type', 
+                                        value_name='Value')
+    
+    fig4 = px.bar(
+        melted_data,
+        x='Plant',
+        y='Value',
+        color='Type',
+        barmode='group',
+        title='🏭 ORDER QTY VS ACTUAL DELIVERY BY PLANT',
+        color_discrete_map={'OrderQty': '#4ECDC4', 'ActualDelivery': '#00FF88'}
+    )
+    
+    # Tambahkan data labels
+    fig4.update_traces(
+        texttemplate='%{y:,.0f}',
+        textposition='outside',
+        textfont=dict(size=9, color='white', family='Orbitron')
+    )
+    
+    fig4.update_layout(
+        height=300,
+        xaxis_tickangle=-45,
+        legend_title_text='TYPE',
+        font=dict(family='Orbitron', size=10),
+        title_font=dict(size=14, color='#00FF88'),
+        margin=dict(t=40, b=20, l=20, r=20)
+    )
+    return fig4
+
+# Fungsi untuk histogram lead time (hari) dengan garis p50/p90/p99; lead time di atas
+# LEAD_TIME_MAX_DAYS digabung ke bar terakhir supaya payload tetap kecil
+def build_lead_time_figure(distribution):
+    if distribution is None or not distribution['orders']:
+        return None
+    histogram = distribution['histogram']
+    histogram = histogram.groupby(np.minimum(histogram.index, LEAD_TIME_MAX_DAYS)).sum()
+    chart_data = pd.DataFrame({'LeadTime': histogram.index, 'Orders': histogram.to_numpy()})
+    quantiles = distribution['quantiles']
+    fig5 = px.bar(
+        chart_data,
+        x='LeadTime',
+        y='Orders',
+        title='⏱️ LEAD TIME (DAYS) • ' + ' • '.join(f"P{quantile * 100:g} {value:g}" for quantile, value in quantiles.items()),
+        color_discrete_sequence=['#4ECDC4']
+    )
+    for (quantile, value), color in zip(quantiles.items(), ['#00FF88', '#FFD93D', '#FF6B6B']):
+        fig5.add_vline(x=min(value, LEAD_TIME_MAX_DAYS), line_dash='dash', line_color=color)
+    fig5.update_layout(
+        height=300,
+        xaxis_title=f'DAYS (≥{LEAD_TIME_MAX_DAYS} GROUPED)' if histogram.index.max() >= LEAD_TIME_MAX_DAYS else 'DAYS',
+        yaxis_title='ORDERS',
+        bargap=0.1,
+        font=dict(family='Orbitron', size=10),
+        title_font=dict(size=14, color='#00FF88'),
+        margin=dict(t=40, b=20, l=20, r=20)
+    )
+    return fig5
+
+# Fungsi untuk fill rate per plant: bar median (P50) dengan rentang P10-P90
+def build_fill_rate_figure(distribution):
+    if distribution is None or distribution['by_plant'].empty:
+        return None
+    by_plant = distribution['by_plant'].sort_values('Orders', ascending=False).head(PLANT_TOP_N)
+    fig6 = px.bar(
+        by_plant,
+        x='Plant',
+        y='P50',
+        error_y=by_plant['P90'] - by_plant['P50'],
+        error_y_minus=by_plant['P50'] - by_plant['P10'],
+        title='🎯 FILL RATE BY PLANT (P10 • P50 • P90)',
+        hover_data={'Orders': ':,', 'P10': ':.0%', 'P90': ':.0%'},
+        color_discrete_sequence=['#00FF88']
+    )
+    fig6.update_traces(
+        texttemplate='%{y:.0%}',
+        textposition='inside',
+        textfont=dict(size=9, color='black', family='Orbitron')
+    )
+    fig6.update_layout(
+        height=300,
+        xaxis_tickangle=-45,
+        yaxis_tickformat='.0%',
+        yaxis_title='FILL RATE',
+        font=dict(family='Orbitron', size=10),
+        title_font=dict(size=14, color='#00FF88'),
+        margin=dict(t=40, b=20, l=20, r=20)
+    )
+    return fig6
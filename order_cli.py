@@ -0,0 +1,148 @@
+import argparse
+import json
+import os
+import sys
+
+import pandas as pd
+
+from order_core import (
+    FilterEngine, StatusKpiKernel, build_order_cube, compute_kpis, cube_col_mapping, ingest_sources, kpi_table,
+    list_local_sources, load_status_map, plant_performance
+)
+
+# Kolom cube untuk opsi --by
+GROUP_COLUMNS = {'plant': 'Plant', 'status': 'Status', 'day': 'CreateDay'}
+
+# Fungsi untuk validasi argumen tanggal (type= argparse, jadi tanggal salah dilaporkan sebagai error argumen)
+def parse_date(value):
+    try:
+        timestamp = pd.Timestamp(value)
+    except ValueError:
+        timestamp = pd.NaT
+    if pd.isna(timestamp):
+        raise argparse.ArgumentTypeError(f"invalid date: {value!r} (expected YYYY-MM-DD)")
+    return timestamp
+
+# Fungsi untuk argumen command line
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compute order & delivery KPIs from export files without the web dashboard."
+    )
+    parser.add_argument('sources', nargs='+', help="CSV/XLSX/SQLite files or folders containing them")
+    parser.add_argument('--header-row', type=int, default=0, help="Header row index (default: 0)")
+    parser.add_argument('--create-from', type=parse_date, help="First create date to include (YYYY-MM-DD)")
+    parser.add_argument('--create-to', type=parse_date, help="Last create date to include (YYYY-MM-DD)")
+    parser.add_argument('--delivery-from', type=parse_date, help="First delivery date to include (YYYY-MM-DD)")
+    parser.add_argument('--delivery-to', type=parse_date, help="Last delivery date to include (YYYY-MM-DD)")
+    parser.add_argument('--plant', action='append', help="Plant to include (repeatable)")
+    parser.add_argument('--status', action='append', help="Status to include (repeatable)")
+    parser.add_argument('--by', choices=sorted(GROUP_COLUMNS), help="Also break the KPIs down per plant, status or create day")
+    parser.add_argument('--format', choices=['json', 'csv', 'html'], default='json', help="Output format (default: json)")
+    parser.add_argument('--output', '-o', help="Output file (default: stdout)")
+    parser.add_argument('--status-map', default=os.environ.get('ORDER_STATUS_MAP', 'status_map.json'),
+                        help="JSON file mapping raw status values to PENDING/BOOKING/CANCEL/DELIVERED")
+    parser.add_argument('--workers', type=int, help="Worker processes for reading many files (default: all cores)")
+    parser.add_argument('--plan-dir', default=os.path.join(os.environ.get('ORDER_CACHE_DIR', '.order_cache'), 'profiles'),
+                        help="Folder for cached parsing plans, shared with the dashboard")
+    return parser.parse_args(argv)
+
+# Batas range tanggal kalau hanya satu sisi yang diisi
+MIN_DATE = '1900-01-01'
+MAX_DATE = '2199-12-31'
+
+# Fungsi untuk range tanggal dari dua argumen (sisi yang kosong = tanpa batas)
+def date_range(start, end):
+    if not start and not end:
+        return None
+    return (pd.Timestamp(start or MIN_DATE), pd.Timestamp(end or MAX_DATE))
+
+# Fungsi untuk daftar file dari argumen (folder diganti isinya)
+def expand_sources(paths):
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            sources.extend(list_local_sources(path))
+        elif os.path.isfile(path):
+            sources.append(path)
+        else:
+            raise FileNotFoundError(f"Source not found: {path}")
+    return sources
+
+# Fungsi untuk membangun laporan: KPI total, jumlah per status, performa per plant, tren harian
+def build_report(sources, filters, by=None, header_row=0, plan_dir=None, max_workers=None, kernel=None):
+    df, col_mapping = ingest_sources(sources, header_row, plan_dir, max_workers)
+    if df is None:
+        raise ValueError("No order data found in the given sources")
+    cube = build_order_cube(df, col_mapping)
+    filtered_cube = cube.iloc[FilterEngine(cube, cube_col_mapping(cube)).select(filters)]
+    kpis = compute_kpis(filtered_cube, col_mapping, kernel)
+    report = {
+        'sources': [os.path.basename(source) for source in sources],
+        'rows': len(df),
+        'filters': {name: value for name, value in filters.items() if value},
+        'kpis': {name: value for name, value in kpis.items() if name != 'status_counts'},
+        'status_counts': {str(status): int(count) for status, count in kpis['status_counts'].items()},
+        'by_plant': plant_performance(filtered_cube).to_dict('records') if 'Plant' in filtered_cube else [],
+        'daily_orders': [
+            {'date': day.strftime('%Y-%m-%d'), 'orders': int(orders)}
+            for day, orders in filtered_cube.groupby('CreateDay')['Orders'].sum().items()
+        ] if 'CreateDay' in filtered_cube else []
+    }
+    table = kpi_table(filtered_cube, col_mapping, GROUP_COLUMNS[by] if by else None, kernel)
+    return report, table
+
+# Fungsi untuk laporan HTML mandiri (tanpa asset eksternal)
+def render_html(report, table):
+    kpis = pd.DataFrame([report['kpis']['status_kpis'] | {
+        name: value for name, value in report['kpis'].items() if name != 'status_kpis'
+    }])
+    filters = ', '.join(f"{name}: {value}" for name, value in report['filters'].items()) or 'none'
+    return f"""<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>Order & Delivery Report</title>
+<style>body {{ font-family: sans-serif; margin: 24px; }} table {{ border-collapse: collapse; margin-bottom: 24px; }}
+th, td {{ border: 1px solid #ccc; padding: 4px 8px; text-align: right; }} th {{ background: #eee; }}</style></head>
+<body>
+<h1>📊 Order & Delivery Report</h1>
+<p>Sources: {', '.join(report['sources'])} • {report['rows']:,} rows • Filters: {filters}</p>
+<h2>KPIs</h2>
+{kpis.to_html(index=False, float_format=lambda value: f"{value:,.1f}")}
+<h2>Breakdown</h2>
+{table.to_html(index=False, float_format=lambda value: f"{value:,.1f}")}
+</body>
+</html>
+"""
+
+# Entry point command line: python order_cli.py FILE... [--by plant] [--format json|csv|html]
+def main(argv=None):
+    args = parse_args(argv)
+    filters = {
+        'create_date_range': date_range(args.create_from, args.create_to),
+        'delivery_date_range': date_range(args.delivery_from, args.delivery_to),
+        'selected_plants': args.plant,
+        'selected_status': args.status
+    }
+    try:
+        sources = expand_sources(args.sources)
+        kernel = StatusKpiKernel(load_status_map(args.status_map))
+        report, table = build_report(sources, filters, args.by, args.header_row, args.plan_dir, args.workers, kernel)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    if args.format == 'json':
+        output = json.dumps(report | {'breakdown': table.to_dict('records')}, indent=2, default=str)
+    elif args.format == 'csv':
+        output = table.to_csv(index=False)
+    else:
+        output = render_html(report, table)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8', newline='') as f:
+            f.write(output)
+    else:
+        sys.stdout.write(output)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
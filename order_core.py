@@ -0,0 +1,1168 @@
+import gzip
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+from order_metrics import stage
+
+# Modul komputasi tanpa Streamlit: bisa di-import oleh worker process dan skrip lain
+
+# Alias nama kolom yang dikenali untuk setiap field dashboard
+COLUMN_ALIASES = {
+    'CreateDate': ['CreateDate', 'Create Date', 'TanggalBuat'],
+    'DeliveryDate': ['Delivery Date', 'DeliveryDate', 'TanggalKirim'],
+    'PlantName': ['Plant Name', 'PlantName', 'NamaPlant'],
+    'Status': ['Status', 'OrderStatus'],
+    'OrderQty': ['Order Qty', 'OrderQty', 'Quantity'],
+    'ActualDelivery': ['Actual Delivery', 'ActualDelivery', 'DeliveredQty'],
+    'OrderID': ['Order ID', 'OrderID'],
+    'SiteNo': ['Site No', 'SiteNo'],
+    'SiteName': ['Site Name', 'SiteName']
+}
+
+DATE_FIELDS = ['CreateDate', 'DeliveryDate']
+NUMERIC_FIELDS = ['OrderQty', 'ActualDelivery']
+CATEGORY_FIELDS = ['PlantName', 'Status']
+SUPPORTED_EXTENSIONS = ('.csv', '.xlsx', '.xls')
+SQLITE_EXTENSIONS = ('.sqlite', '.sqlite3', '.db')
+SOURCE_COLUMN = 'Source'
+
+# Mapping kolom cube ke field dashboard (dipakai FilterEngine pada cube)
+CUBE_MAPPING = {'CreateDate': 'CreateDay', 'DeliveryDate': 'DeliveryDay', 'PlantName': 'Plant', 'Status': 'Status'}
+
+# Fungsi untuk menemukan kolom
+def find_column(df, target_names):
+    target_names = [str(name).lower().replace(' ', '').replace('_', '') for name in target_names]
+
+    for col in df.columns:
+        normalized_col = str(col).lower().replace(' ', '').replace('_', '')
+        for target in target_names:
+            if normalized_col == target:
+                return col
+    return None
+
+# Fungsi untuk mendeteksi semua kolom sekaligus
+def detect_columns(df):
+    return {field: find_column(df, aliases) for field, aliases in COLUMN_ALIASES.items()}
+
+# Fungsi untuk menebak format kolom tanggal dari nilai pertama yang terisi
+def guess_date_format(series):
+    sample = series.dropna()
+    if not sample.empty and isinstance(sample.iloc[0], str):
+        return guess_datetime_format(sample.iloc[0].strip())
+    return None
+
+# Fungsi untuk menebak format semua kolom tanggal sekaligus
+def guess_date_formats(df, col_mapping):
+    return {field: guess_date_format(df[col_mapping[field]]) for field in DATE_FIELDS if col_mapping.get(field)}
+
+# Fungsi untuk parsing kolom tanggal (format ditebak sekali dari nilai pertama)
+def parse_date_column(series, date_format=None):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    if date_format is None:
+        date_format = guess_date_format(series)
+    try:
+        return pd.to_datetime(series, format=date_format, errors='coerce')
+    except (ValueError, TypeError):
+        return pd.to_datetime(series, errors='coerce')
+
+# Fungsi untuk mengubah kolom plant/status menjadi kategori string
+def categorize_columns(df, col_mapping):
+    for field in CATEGORY_FIELDS:
+        col = col_mapping.get(field)
+        if col and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            values = df[col]
+            df[col] = values.where(values.isna(), values.astype(str)).astype('category')
+    return df
+
+# Fungsi untuk mengubah data mentah menjadi frame kanonik (tanggal, angka, kategori sudah bertipe)
+def normalize_dataframe(df, col_mapping, date_formats=None, categorize=True):
+    date_formats = date_formats or {}
+    for field in DATE_FIELDS:
+        if col_mapping.get(field):
+            df[col_mapping[field]] = parse_date_column(df[col_mapping[field]], date_formats.get(field))
+    for field in NUMERIC_FIELDS:
+        if col_mapping.get(field):
+            df[col_mapping[field]] = pd.to_numeric(df[col_mapping[field]], errors='coerce')
+    if categorize:
+        df = categorize_columns(df, col_mapping)
+    return df
+
+# Fungsi untuk mengurutkan frame kanonik berdasarkan CreateDate (syarat FilterEngine)
+def sort_by_create_date(df, col_mapping):
+    if col_mapping.get('CreateDate'):
+        df = df.sort_values(col_mapping['CreateDate'], kind='stable', na_position='last', ignore_index=True)
+    return df
+
+# Fungsi untuk membaca file sesuai parsing plan (hanya kolom terpetakan, dtype eksplisit)
+def read_with_plan(source, header_row, plan, sheet_name=0, **kwargs):
+    options = {'header': header_row}
+    if plan is not None:
+        options['usecols'] = plan['usecols']
+        options['dtype'] = plan['dtype']
+    options.update(kwargs)
+    source.seek(0)
+    if source.name.endswith('.csv'):
+        return pd.read_csv(source, **options)
+    return pd.read_excel(source, engine='openpyxl', sheet_name=sheet_name, **options)
+
+# Fungsi untuk memproses data
+def process_uploaded_file(uploaded_file, header_row=0, plan=None, sheet_name=0):
+    if not uploaded_file.name.endswith(SUPPORTED_EXTENSIONS):
+        return None
+    try:
+        df = read_with_plan(uploaded_file, header_row, plan, sheet_name)
+    except (ValueError, TypeError):
+        # Nilai kotor pada kolom angka: ulangi tanpa dtype angka dari plan
+        if plan is None:
+            raise
+        df = read_with_plan(uploaded_file, header_row, plan, sheet_name, dtype=plan['text_dtype'])
+
+    # Bersihkan data
+    df.columns = [str(col).strip() for col in df.columns]
+    df = df.dropna(axis=1, how='all')
+    df = df.dropna(how='all')
+
+    return df
+
+# Fungsi untuk membaca baris header saja
+def read_header(source, header_row=0, sheet_name=0):
+    header = read_with_plan(source, header_row, None, sheet_name, nrows=0)
+    source.seek(0)
+    return [str(col) for col in header.columns]
+
+# Versi format parsing plan (plan tersimpan dengan versi lain tidak dipakai ulang)
+PLAN_VERSION = 2
+
+# Fungsi untuk signature layout export (nama kolom + header row + jenis file)
+def header_signature(columns, header_row, file_kind):
+    payload = json.dumps([PLAN_VERSION, file_kind, header_row, columns])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+# Fungsi untuk membangun parsing plan dari header: mapping kolom, usecols dan dtype teks
+def build_parsing_plan(columns, signature):
+    stripped = {col.strip(): col for col in columns}
+    col_mapping = detect_columns(pd.DataFrame(columns=list(stripped)))
+    mapped = [stripped[col] for col in dict.fromkeys(col for col in col_mapping.values() if col)]
+    text_dtype = {
+        stripped[col_mapping[field]]: 'str'
+        for field in ['PlantName', 'Status', 'OrderID', 'SiteName'] if col_mapping[field]
+    }
+    return {
+        'signature': signature,
+        'usecols': mapped or None,
+        'col_mapping': col_mapping,
+        'text_dtype': text_dtype,
+        'dtype': dict(text_dtype),
+        'complete': False
+    }
+
+# Fungsi untuk melengkapi plan setelah pembacaan pertama: kolom angka dibaca langsung sebagai float64.
+# Plan dipakai semua file dengan header yang sama, jadi hanya berisi yang berlaku untuk semua file;
+# format tanggal ditebak per file dan nilai kotor di file lain jatuh ke fallback dtype teks.
+def complete_parsing_plan(plan, df, plan_dir=None):
+    col_mapping = plan['col_mapping']
+    for field in NUMERIC_FIELDS:
+        col = col_mapping.get(field)
+        if col and col in df and pd.api.types.is_numeric_dtype(df[col]):
+            original = next(name for name in plan['usecols'] if name.strip() == col)
+            plan['dtype'][original] = 'float64'
+    plan['complete'] = True
+    if plan_dir:
+        save_parsing_plan(plan, plan_dir)
+
+# Fungsi untuk menyimpan parsing plan
+def save_parsing_plan(plan, plan_dir):
+    os.makedirs(plan_dir, exist_ok=True)
+    with open(os.path.join(plan_dir, f"{plan['signature']}.json"), 'w') as f:
+        json.dump(plan, f)
+
+# Fungsi untuk mendapatkan parsing plan: dari cache profil jika layout sudah dikenal
+def get_parsing_plan(source, header_row=0, plan_dir=None, sheet_name=0):
+    columns = read_header(source, header_row, sheet_name)
+    file_kind = 'csv' if source.name.endswith('.csv') else 'excel'
+    signature = header_signature(columns, header_row, file_kind)
+    if plan_dir:
+        try:
+            with open(os.path.join(plan_dir, f"{signature}.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    return build_parsing_plan(columns, signature)
+
+# Fungsi untuk mapping kolom dari plan, hanya kolom yang masih ada setelah pembersihan
+def plan_col_mapping(plan, df):
+    return {field: (col if col in df.columns else None) for field, col in plan['col_mapping'].items()}
+
+# Fungsi untuk nama file dari sumber: path lokal atau tuple (nama, bytes) hasil upload
+def source_name(source):
+    return os.path.basename(source) if isinstance(source, str) else source[0]
+
+# Fungsi untuk membuka sumber sebagai file-like yang punya atribut name
+def open_source(source):
+    if isinstance(source, str):
+        return open(source, 'rb')
+    handle = io.BytesIO(source[1])
+    handle.name = source[0]
+    return handle
+
+# Fungsi untuk daftar file data di folder lokal
+def list_folder_files(folder):
+    if not folder or not os.path.isdir(folder):
+        return []
+    return sorted(
+        os.path.join(folder, name) for name in os.listdir(folder)
+        if name.endswith(SUPPORTED_EXTENSIONS + SQLITE_EXTENSIONS) and os.path.isfile(os.path.join(folder, name))
+    )
+
+# Fungsi untuk sumber lokal: semua file data di folder, atau satu file SQLite
+def list_local_sources(path):
+    if path and os.path.isfile(path) and path.endswith(SQLITE_EXTENSIONS):
+        return [path]
+    return list_folder_files(path)
+
+# Fungsi untuk daftar tabel di file SQLite
+def list_sqlite_tables(path):
+    with sqlite3.connect(f"file:{path}?mode=ro", uri=True) as con:
+        return [row[0] for row in con.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+
+# Fungsi untuk membaca tabel SQLite (opsional hanya rowid > after_rowid). Mengembalikan (frame, rowid maksimum).
+def read_sqlite_table(path, table, after_rowid=None):
+    sql = f"SELECT rowid AS __rowid, * FROM {quote_identifier(table)}"
+    params = ()
+    if after_rowid is not None:
+        sql += " WHERE rowid > ?"
+        params = (after_rowid,)
+    with sqlite3.connect(f"file:{path}?mode=ro", uri=True) as con:
+        df = pd.read_sql_query(sql + " ORDER BY rowid", con, params=params)
+    max_rowid = int(df['__rowid'].max()) if len(df) else after_rowid
+    return df.drop(columns='__rowid'), max_rowid
+
+# Fungsi untuk watermark per tabel SQLite: [rowid maksimum, jumlah baris] (dasar refresh inkremental)
+def sqlite_watermarks(path):
+    with sqlite3.connect(f"file:{path}?mode=ro", uri=True) as con:
+        return {table: list(con.execute(f"SELECT MAX(rowid), COUNT(*) FROM {quote_identifier(table)}").fetchone()) for table in list_sqlite_tables(path)}
+
+# Fungsi untuk bagian CSV yang ditambahkan sejak versi sebelumnya, sebagai sumber (nama, bytes)
+# berisi baris header + baris baru. None kalau file tidak hanya bertambah di akhir (isi lama berubah
+# atau baris terakhirnya belum lengkap) atau isi saat ini bukan versi current_digest.
+def read_appended_csv(path, previous_digest, previous_size, current_digest, header_row=0):
+    with open(path, 'rb') as f:
+        content = f.read()
+    if len(content) <= previous_size or hashlib.sha256(content).hexdigest() != current_digest:
+        return None
+    prefix = content[:previous_size]
+    if not prefix.endswith(b'\n') or hashlib.sha256(prefix).hexdigest() != previous_digest:
+        return None
+    header_end = 0
+    for _ in range(header_row + 1):
+        header_end = prefix.find(b'\n', header_end) + 1
+        if header_end == 0:
+            return None
+    return os.path.basename(path), prefix[:header_end] + content[previous_size:]
+
+# Fungsi untuk memecah sumber menjadi task per file (CSV) atau per sheet (Excel)
+def list_source_tasks(sources, header_row=0, plan_dir=None):
+    tasks = []
+    for source in sources:
+        name = source_name(source)
+        if name.endswith(('.xlsx', '.xls')):
+            with open_source(source) as handle:
+                sheet_names = pd.ExcelFile(handle, engine='openpyxl').sheet_names
+            tasks.extend((source, sheet, header_row, plan_dir) for sheet in sheet_names)
+        elif name.endswith('.csv'):
+            tasks.append((source, 0, header_row, plan_dir))
+        elif name.endswith(SQLITE_EXTENSIONS) and isinstance(source, str):
+            tasks.extend((source, table, header_row, plan_dir) for table in list_sqlite_tables(source))
+    return tasks
+
+# Fungsi untuk menormalkan frame dari tabel SQLite (tipe kolom sudah dari database, tanpa parsing plan)
+def normalize_sqlite_frame(df):
+    df.columns = [str(col).strip() for col in df.columns]
+    col_mapping = detect_columns(df)
+    return normalize_dataframe(df, col_mapping, categorize=False), col_mapping
+
+# Fungsi worker: membaca satu file/sheet menjadi frame bertipe (kategori dibuat setelah digabung)
+def read_source_task(task):
+    source, sheet_name, header_row, plan_dir = task
+    name = source_name(source)
+    if name.endswith(SQLITE_EXTENSIONS):
+        df, col_mapping = normalize_sqlite_frame(read_sqlite_table(source, sheet_name)[0])
+        return df, col_mapping, f"{name} [{sheet_name}]"
+    with open_source(source) as handle, stage('read_file') as record:
+        plan = get_parsing_plan(handle, header_row, plan_dir, sheet_name)
+        df = process_uploaded_file(handle, header_row, plan, sheet_name)
+        record['rows_out'] = len(df)
+    col_mapping = plan_col_mapping(plan, df)
+    if not plan['complete']:
+        complete_parsing_plan(plan, df, plan_dir)
+    with stage('parse_types', len(df)) as record:
+        df = normalize_dataframe(df, col_mapping, guess_date_formats(df, col_mapping), categorize=False)
+        record['rows_out'] = len(df)
+    tag = name if name.endswith('.csv') else f"{name} [{sheet_name}]"
+    return df, col_mapping, tag
+
+# Fungsi untuk menggabungkan hasil beberapa file/sheet menjadi satu dataset.
+# Kolom diseragamkan ke nama kolom pertama yang terdeteksi per field, setiap baris diberi
+# tag Source, dan file tanpa kolom plant memakai nama file sebagai plant.
+def combine_sources(results):
+    results = [result for result in results if len(result[0]) and any(result[1].values())]
+    if not results:
+        return None, {}
+    if len(results) == 1:
+        return results[0][0], results[0][1]
+
+    col_mapping = {field: None for field in COLUMN_ALIASES}
+    for _, mapping, _ in results:
+        for field, col in mapping.items():
+            if col and not col_mapping[field]:
+                col_mapping[field] = col
+
+    frames = []
+    for df, mapping, tag in results:
+        df = df.rename(columns={col: col_mapping[field] for field, col in mapping.items() if col})
+        df[SOURCE_COLUMN] = tag
+        plant_col = col_mapping['PlantName']
+        if plant_col and plant_col not in df:
+            df[plant_col] = os.path.splitext(tag)[0]
+        frames.append(df)
+    df = pd.concat(frames, ignore_index=True)
+    df[SOURCE_COLUMN] = df[SOURCE_COLUMN].astype('category')
+    if not col_mapping['PlantName']:
+        col_mapping['PlantName'] = SOURCE_COLUMN
+    return df, col_mapping
+
+# Fungsi untuk ingestion banyak file/sheet secara paralel dengan process pool
+def ingest_sources(sources, header_row=0, plan_dir=None, max_workers=None):
+    tasks = list_source_tasks(sources, header_row, plan_dir)
+    if len(tasks) <= 1:
+        results = [read_source_task(task) for task in tasks]
+    else:
+        workers = min(len(tasks), max_workers or os.cpu_count() or 1)
+        # spawn, bukan fork: proses server Streamlit punya banyak thread
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            results = list(pool.map(read_source_task, tasks))
+    df, col_mapping = combine_sources(results)
+    if df is None:
+        return None, {}
+    df = sort_by_create_date(categorize_columns(df, col_mapping), col_mapping)
+    return df, col_mapping
+
+# Fungsi untuk key OrderID sebagai string (ID integer yang terbaca sebagai float jadi "123", bukan "123.0")
+def order_keys(values):
+    if pd.api.types.is_float_dtype(values) and values.dropna().mod(1).eq(0).all():
+        values = values.astype('Int64')
+    return values.astype(str)
+
+# Fungsi untuk menyamakan kolom dan dtype frame delta dengan frame dasar. Kategori digabung
+# (kode kategori lama tidak berubah); dengan unique_orders hanya baris terakhir per OrderID yang dipakai.
+# Mengembalikan (delta, dtype kategori baru per kolom frame dasar).
+def align_delta(df, delta, col_mapping, delta_mapping, unique_orders=False):
+    delta = delta.rename(columns={delta_mapping[field]: col for field, col in col_mapping.items() if col and delta_mapping.get(field)})
+    delta = delta.reindex(columns=df.columns)
+    if unique_orders:
+        order_col = col_mapping['OrderID']
+        delta = delta[~(order_keys(delta[order_col]).duplicated(keep='last') & delta[order_col].notna()).to_numpy()]
+    
+    base_dtypes = {}
+    for col in df.columns:
+        dtype = df[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            values = delta[col]
+            values = values.where(values.isna(), values.astype(str))
+            new_categories = pd.Index(values.dropna().unique()).difference(dtype.categories)
+            if len(new_categories):
+                dtype = pd.CategoricalDtype(dtype.categories.append(new_categories))
+                base_dtypes[col] = dtype
+            delta[col] = values.astype(dtype)
+        else:
+            try:
+                delta[col] = delta[col].astype(dtype)
+            except (TypeError, ValueError):
+                pass
+    return delta, base_dtypes
+
+# Fungsi untuk menyisipkan delta ke frame dasar sesuai urutan CreateDate tanpa sort ulang seluruh
+# frame (baris delta masuk setelah baris dasar dengan tanggal yang sama). Frame dasar tidak dimodifikasi.
+# Mengembalikan (frame baru, delta terurut).
+def insert_by_create_date(base, delta, col_mapping, base_dtypes):
+    if base_dtypes:
+        base = base.copy(deep=False)
+        for col, dtype in base_dtypes.items():
+            base[col] = base[col].cat.set_categories(dtype.categories)
+    
+    create_col = col_mapping.get('CreateDate')
+    if create_col:
+        delta = delta.sort_values(create_col, kind='stable', na_position='last')
+        insert_at = np.searchsorted(base[create_col].to_numpy(), delta[create_col].to_numpy(), side='right')
+    else:
+        insert_at = np.full(len(delta), len(base))
+    order = np.empty(len(base) + len(delta), dtype=np.int64)
+    order[np.arange(len(base)) + np.searchsorted(insert_at, np.arange(len(base)), side='right')] = np.arange(len(base))
+    order[insert_at + np.arange(len(delta))] = len(base) + np.arange(len(delta))
+    return pd.concat([base, delta], ignore_index=True).take(order).reset_index(drop=True), delta
+
+# Fungsi untuk upsert frame delta ke frame kanonik berdasarkan OrderID. order_index adalah
+# pd.Index dari order_keys frame dasar (dibuat sekali per dataset). Frame dasar tidak dimodifikasi.
+# Mengembalikan (frame baru, baris lama yang diganti, baris delta yang masuk).
+def upsert_orders(df, delta, col_mapping, delta_mapping, order_index):
+    order_col = col_mapping['OrderID']
+    delta, base_dtypes = align_delta(df, delta, col_mapping, delta_mapping, unique_orders=True)
+    
+    delta_keys = order_keys(delta[order_col])
+    if order_index.is_unique:
+        positions = order_index.get_indexer(delta_keys)
+    else:
+        positions = order_index.get_indexer_non_unique(delta_keys)[0]
+    positions = positions[positions >= 0]
+    if delta[order_col].isna().any():
+        positions = positions[df[order_col].iloc[positions].notna().to_numpy()]
+    replaced = np.unique(positions)
+    keep = np.ones(len(df), dtype=bool)
+    keep[replaced] = False
+    merged, delta = insert_by_create_date(df[keep], delta, col_mapping, base_dtypes)
+    return merged, df.iloc[replaced], delta
+
+# Fungsi untuk menambahkan baris baru (misalnya baris yang di-append ke sumber) ke frame kanonik,
+# tanpa pencocokan OrderID: hasilnya sama dengan membaca ulang sumber lengkap.
+# Mengembalikan (frame baru, baris delta yang masuk).
+def append_orders(df, delta, col_mapping, delta_mapping):
+    delta, base_dtypes = align_delta(df, delta, col_mapping, delta_mapping)
+    return insert_by_create_date(df, delta, col_mapping, base_dtypes)
+
+# Kelas untuk filter berbasis index, dibangun sekali per dataset.
+# Frame harus sudah terurut berdasarkan CreateDate (NaT di akhir), sehingga
+# range tanggal buat cukup dua searchsorted; plant/status memakai lookup kode kategori.
+class FilterEngine:
+    def __init__(self, df, col_mapping):
+        self.n_rows = len(df)
+        self.create = None
+        self.delivery = None
+        self.delivery_order = None
+        self.categories = {}
+        self.codes = {}
+        
+        if col_mapping.get('CreateDate'):
+            self.create = df[col_mapping['CreateDate']].to_numpy(dtype='datetime64[ns]')
+        if col_mapping.get('DeliveryDate'):
+            delivery = df[col_mapping['DeliveryDate']].to_numpy(dtype='datetime64[ns]')
+            self.delivery_order = np.argsort(delivery, kind='stable')
+            self.delivery = delivery[self.delivery_order]
+        for field in CATEGORY_FIELDS:
+            col = col_mapping.get(field)
+            if col:
+                self.categories[field] = df[col].cat.categories
+                self.codes[field] = df[col].cat.codes.to_numpy()
+    
+    # Posisi [lo, hi) untuk range tanggal inklusif per hari pada array terurut
+    @staticmethod
+    def _date_bounds(sorted_dates, date_range):
+        start = np.datetime64(pd.Timestamp(date_range[0]).normalize(), 'ns')
+        end = np.datetime64(pd.Timestamp(date_range[1]).normalize() + pd.Timedelta(days=1), 'ns')
+        return np.searchsorted(sorted_dates, start, 'left'), np.searchsorted(sorted_dates, end, 'left')
+    
+    # Bitmap kode kategori yang dipilih; index -1 (NaN) jatuh ke slot terakhir yang selalu False
+    def _category_bitmap(self, field, selected):
+        categories = self.categories[field]
+        bitmap = np.zeros(len(categories) + 1, dtype=bool)
+        codes = categories.get_indexer(list(selected))
+        bitmap[codes[codes >= 0]] = True
+        return bitmap
+    
+    # Mengembalikan posisi baris (terurut) yang lolos semua filter
+    def select(self, filters):
+        lo, hi = 0, self.n_rows
+        create_range = filters.get('create_date_range')
+        if self.create is not None and create_range and len(create_range) == 2:
+            lo, hi = self._date_bounds(self.create, create_range)
+        keep = None
+        
+        delivery_range = filters.get('delivery_date_range')
+        if self.delivery is not None and delivery_range and len(delivery_range) == 2:
+            d_lo, d_hi = self._date_bounds(self.delivery, delivery_range)
+            if d_hi - d_lo < hi - lo:
+                positions = np.sort(self.delivery_order[d_lo:d_hi])
+                positions = positions[(positions >= lo) & (positions < hi)]
+            else:
+                in_range = np.zeros(self.n_rows, dtype=bool)
+                in_range[self.delivery_order[d_lo:d_hi]] = True
+                positions = lo + np.flatnonzero(in_range[lo:hi])
+        else:
+            positions = np.arange(lo, hi)
+        
+        for field, filter_key in [('PlantName', 'selected_plants'), ('Status', 'selected_status')]:
+            selected = filters.get(filter_key)
+            if field in self.codes and selected:
+                bitmap = self._category_bitmap(field, selected)
+                positions = positions[bitmap[self.codes[field][positions]]]
+        return positions
+
+# Fungsi untuk membangun cube agregat (create day x delivery day x plant x status)
+def build_order_cube(df, col_mapping):
+    keys = {}
+    for field, cube_col in CUBE_MAPPING.items():
+        col = col_mapping.get(field)
+        if col:
+            keys[cube_col] = df[col].dt.normalize() if field in DATE_FIELDS else df[col]
+    values = {
+        measure: df[col_mapping[measure]] if col_mapping.get(measure) else pd.Series(0.0, index=df.index)
+        for measure in NUMERIC_FIELDS
+    }
+    frame = pd.DataFrame({**keys, **values})
+    aggregations = {
+        'Orders': ('OrderQty', 'size'),
+        'OrderQty': ('OrderQty', 'sum'),
+        'ActualDelivery': ('ActualDelivery', 'sum')
+    }
+    if not keys:
+        return frame.agg(**{name: agg for name, (_, agg) in aggregations.items()}).T.reset_index(drop=True)
+    cube = frame.groupby(list(keys), observed=True, dropna=False).agg(**aggregations).reset_index()
+    return finalize_order_cube(cube)
+
+# Fungsi untuk merapikan cube: plant/status kategori, urut berdasarkan CreateDay
+def finalize_order_cube(cube):
+    cube = categorize_columns(cube, {'PlantName': 'Plant', 'Status': 'Status'})
+    if 'CreateDay' in cube:
+        cube = cube.sort_values('CreateDay', kind='stable', na_position='last', ignore_index=True)
+    return cube
+
+# Fungsi untuk menggabungkan beberapa cube parsial (misalnya per chunk) menjadi satu
+def merge_order_cubes(cubes):
+    cube = pd.concat(cubes, ignore_index=True)
+    keys = [col for col in CUBE_MAPPING.values() if col in cube]
+    if not keys:
+        return cube.sum().to_frame().T
+    for col in ['Plant', 'Status']:
+        if col in cube:
+            cube[col] = cube[col].astype(object)
+    cube = cube.groupby(keys, dropna=False, sort=False)[['Orders', 'OrderQty', 'ActualDelivery']].sum().reset_index()
+    return finalize_order_cube(cube)
+
+# Fungsi untuk memperbarui cube secara inkremental: kontribusi baris lama dikurangi,
+# baris delta ditambahkan; biayanya sebanding jumlah grup + ukuran delta
+def update_order_cube(cube, replaced_rows, added_rows, col_mapping):
+    removed = build_order_cube(replaced_rows, col_mapping)
+    removed[NUMERIC_FIELDS + ['Orders']] = -removed[NUMERIC_FIELDS + ['Orders']]
+    cube = merge_order_cubes([cube, removed, build_order_cube(added_rows, col_mapping)])
+    return cube[cube['Orders'] != 0].reset_index(drop=True)
+
+# Fungsi untuk col_mapping cube (field -> kolom cube yang ada), dipakai FilterEngine di atas cube
+def cube_col_mapping(cube):
+    return {field: cube_col for field, cube_col in CUBE_MAPPING.items() if cube_col in cube}
+
+# Grup status untuk kartu KPI status (label kartu -> nilai status yang dijumlahkan).
+# File mapping status bisa menambah/mengganti entri ini.
+STATUS_KPI_GROUPS = {
+    'PENDING': ['Pending', 'Pending Confirmation'],
+    'BOOKING': ['On Booking', 'Booking'],
+    'CANCEL': ['Canceled', 'Cancelled', 'Cancel'],
+    'DELIVERED': ['Delivered']
+}
+
+# Fungsi untuk bentuk kanonik status mentah: huruf kecil, spasi dirapikan
+def canonical_status(values):
+    return pd.Index(values).astype(str).str.split().str.join(' ').str.casefold()
+
+# Fungsi untuk membaca file mapping status (JSON: {"status mentah": "BUCKET"}), digabung di atas
+# STATUS_KPI_GROUPS. Bucket harus salah satu label kartu; nilai null menghapus status dari bucket.
+# Key dikembalikan dalam bentuk kanonik, jadi override "delivered" juga berlaku untuk "Delivered".
+def load_status_map(path=None):
+    defaults = {status: bucket for bucket, statuses in STATUS_KPI_GROUPS.items() for status in statuses}
+    status_map = dict(zip(canonical_status(list(defaults)), defaults.values()))
+    if path and os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            overrides = json.load(f)
+        unknown = sorted({bucket for bucket in overrides.values() if bucket is not None} - set(STATUS_KPI_GROUPS))
+        if unknown:
+            raise ValueError(f"Unknown status bucket(s) in {path}: {', '.join(unknown)}; use {', '.join(STATUS_KPI_GROUPS)}")
+        status_map.update(zip(canonical_status(list(overrides)), overrides.values()))
+    return {status: bucket for status, bucket in status_map.items() if bucket is not None}
+
+# Kernel KPI: status dipetakan ke bucket sekali per daftar kategori (lookup kode kategori ->
+# bucket), lalu semua KPI dihitung dari bincount atas kode status cube
+class StatusKpiKernel:
+    def __init__(self, status_map=None):
+        status_map = load_status_map() if status_map is None else status_map
+        self.buckets = list(STATUS_KPI_GROUPS)
+        canonical = canonical_status(list(status_map))
+        self.lookup = pd.Series([self.buckets.index(bucket) for bucket in status_map.values()], index=canonical)
+        self.lookup = self.lookup[~self.lookup.index.duplicated(keep='last')]
+        self._cached = (None, None)
+    
+    # Bucket per slot kode status: slot 0 = status kosong, slot i + 1 = kategori i; -1 = tanpa bucket
+    def slot_buckets(self, categories):
+        cached_categories, buckets = self._cached
+        if cached_categories is not categories and not (cached_categories is not None and cached_categories.equals(categories)):
+            mapped = self.lookup.reindex(canonical_status(categories)).fillna(-1).to_numpy(dtype=np.int64)
+            buckets = np.concatenate([[-1], mapped])
+            self._cached = (categories, buckets)
+        return buckets
+
+DEFAULT_STATUS_KERNEL = StatusKpiKernel(load_status_map())
+
+# Fungsi untuk menghitung KPI dari cube (atau cube terfilter): total order/qty,
+# order vs actual delivery, jumlah order per status dan kartu status. Satu bincount per measure
+# atas kode status; total, jumlah per status dan kartu bucket diturunkan dari hasilnya.
+def compute_kpis(cube, col_mapping, kernel=None):
+    kernel = kernel or DEFAULT_STATUS_KERNEL
+    has_status = bool(col_mapping.get('Status')) and 'Status' in cube
+    if has_status:
+        categories = cube['Status'].cat.categories
+        slots = cube['Status'].cat.codes.to_numpy().astype(np.int64) + 1
+    else:
+        categories = pd.Index([])
+        slots = np.zeros(len(cube), dtype=np.int64)
+    per_slot = {
+        measure: np.bincount(slots, weights=cube[measure].to_numpy(dtype='float64'), minlength=len(categories) + 1)
+        for measure in ['Orders'] + NUMERIC_FIELDS
+    }
+    
+    total_orders = int(per_slot['Orders'].sum())
+    total_qty = float(per_slot['OrderQty'].sum()) if col_mapping.get('OrderQty') else total_orders
+    if has_status:
+        status_counts = pd.Series(per_slot['Orders'][1:].astype(np.int64), index=categories, name='Orders')
+        status_counts.index.name = 'Status'
+        status_counts = status_counts[status_counts > 0].sort_values(ascending=False, kind='stable')
+        buckets = kernel.slot_buckets(categories)
+        keep = buckets >= 0
+        bucket_orders = np.bincount(buckets[keep], weights=per_slot['Orders'][keep], minlength=len(kernel.buckets))
+    else:
+        status_counts = pd.Series(dtype='int64')
+        bucket_orders = np.zeros(len(kernel.buckets))
+    status_kpis = {label: int(count) for label, count in zip(kernel.buckets, bucket_orders)}
+    
+    if col_mapping.get('OrderQty') and col_mapping.get('ActualDelivery'):
+        order_qty = float(per_slot['OrderQty'].sum())
+        actual_delivery = float(per_slot['ActualDelivery'].sum())
+        delivery_ratio = (actual_delivery / order_qty * 100) if order_qty > 0 else 0
+    else:
+        order_qty = actual_delivery = delivery_ratio = 0
+    
+    return {
+        'total_orders': total_orders,
+        'total_qty': total_qty,
+        'order_qty': order_qty,
+        'actual_delivery': actual_delivery,
+        'delivery_ratio': delivery_ratio,
+        'status_kpis': status_kpis,
+        'status_counts': status_counts
+    }
+
+# Fungsi untuk order qty vs actual delivery per plant
+def plant_performance(cube):
+    performance = cube.groupby('Plant', observed=True)[['OrderQty', 'ActualDelivery']].sum().reset_index()
+    performance['Plant'] = performance['Plant'].astype(str)
+    return performance
+
+# Fungsi untuk tabel KPI per grup (kolom cube, misalnya Plant) ditambah baris TOTAL
+def kpi_table(cube, col_mapping, by=None, kernel=None):
+    groups = [] if by is None else list(cube.groupby(by, observed=True, sort=True))
+    rows = []
+    for key, group in groups + [('TOTAL', cube)]:
+        kpis = compute_kpis(group, col_mapping, kernel)
+        row = {by or 'Group': key.strftime('%Y-%m-%d') if isinstance(key, pd.Timestamp) else key}
+        row.update({name: value for name, value in kpis.items() if name not in ('status_kpis', 'status_counts')})
+        row.update(kpis['status_kpis'])
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+# Pilihan periode pembanding untuk mode perbandingan
+COMPARISON_MODES = ['Previous period', 'Same period last month', 'Custom range']
+
+# Fungsi untuk range create date periode pembanding: periode sebelumnya dengan panjang yang sama,
+# periode yang sama bulan lalu, atau range custom. None kalau range tidak lengkap.
+def baseline_range(create_range, mode, custom_range=None):
+    if not create_range or len(create_range) != 2:
+        return None
+    start, end = (pd.Timestamp(value).normalize() for value in create_range)
+    if mode == 'Previous period':
+        length = end - start + pd.Timedelta(days=1)
+        return start - length, end - length
+    if mode == 'Same period last month':
+        return start - pd.DateOffset(months=1), end - pd.DateOffset(months=1)
+    if mode == 'Custom range' and custom_range and len(custom_range) == 2:
+        return tuple(pd.Timestamp(value).normalize() for value in custom_range)
+    return None
+
+# Fungsi untuk filter satu query yang mencakup kedua periode: range create date diganti span
+# gabungan periode saat ini dan pembanding, filter lain tetap
+def comparison_filters(filters, baseline):
+    start, end = (pd.Timestamp(value).normalize() for value in filters['create_date_range'])
+    return filters | {'create_date_range': (min(start, baseline[0]), max(end, baseline[1]))}
+
+# Fungsi untuk memotong cube (terurut CreateDay) ke satu range create date; cukup dua searchsorted
+def slice_period(cube, date_range):
+    lo, hi = FilterEngine._date_bounds(cube['CreateDay'].to_numpy(dtype='datetime64[ns]'), date_range)
+    return cube.iloc[lo:hi]
+
+# Rollup plant -> site untuk drill-down. Kode grup (plant, site) dan posisi baris per grup
+# dihitung sekali per dataset; total untuk selection filter cukup satu bincount, dan setiap
+# langkah drill (site per plant, order per site) hanya slice dari array yang sudah terurut.
+class SiteRollups:
+    def __init__(self, df, col_mapping):
+        self.site_columns = [col_mapping[field] for field in ['SiteNo', 'SiteName'] if col_mapping.get(field)]
+        plant = df[col_mapping['PlantName']]
+        self.plants = plant.cat.categories
+        plant_codes = plant.cat.codes.to_numpy().astype(np.int64)
+        if self.site_columns:
+            site_codes, site_values = pd.factorize(df[self.site_columns[0]])
+        else:
+            site_codes, site_values = np.full(len(df), -1), pd.Index([])
+        n_sites = len(site_values) + 1
+        
+        # Kunci grup terurut per plant lalu site; baris tanpa plant tidak ikut (kode -1)
+        valid = plant_codes >= 0
+        group_keys, inverse = np.unique(plant_codes[valid] * n_sites + site_codes[valid] + 1, return_inverse=True)
+        self.group_codes = np.full(len(df), -1, dtype=np.int64)
+        self.group_codes[valid] = inverse
+        self.group_plant = group_keys // n_sites
+        self.plant_offsets = np.searchsorted(self.group_plant, np.arange(len(self.plants) + 1))
+        
+        # Posisi baris per grup (argsort stabil: di dalam grup tetap urut CreateDate)
+        self.group_rows = np.argsort(self.group_codes, kind='stable')
+        counts = np.bincount(inverse, minlength=len(group_keys))
+        self.row_offsets = int((~valid).sum()) + np.concatenate([[0], np.cumsum(counts)])
+        first_rows = self.group_rows[self.row_offsets[:-1]]
+        labels = {'Plant': self.plants[self.group_plant].astype(str)}
+        for col in self.site_columns:
+            labels[col] = df[col].to_numpy()[first_rows] if len(first_rows) else []
+        self.labels = pd.DataFrame(labels)
+        
+        self.measures = {
+            measure: np.nan_to_num(df[col_mapping[measure]].to_numpy(dtype='float64', na_value=np.nan))
+            if col_mapping.get(measure) else np.zeros(len(df))
+            for measure in NUMERIC_FIELDS
+        }
+        self.all_totals = self.totals()
+    
+    @staticmethod
+    def _fill_ratio(table):
+        table['FillRatio'] = (table['ActualDelivery'] / table['OrderQty'].where(table['OrderQty'] > 0)).astype('float64')
+        return table
+    
+    # Total per grup (plant, site) untuk selection filter (None = semua baris); index = kode grup
+    def totals(self, selection=None):
+        codes = self.group_codes if selection is None else self.group_codes[selection]
+        keep = codes >= 0
+        codes = codes[keep]
+        table = self.labels.copy()
+        table['Orders'] = np.bincount(codes, minlength=len(table))
+        for measure, values in self.measures.items():
+            values = values if selection is None else values[selection]
+            table[measure] = np.bincount(codes, weights=values[keep], minlength=len(table))
+        return self._fill_ratio(table)
+    
+    # Total per plant dari total grup (bincount atas grup, bukan atas baris)
+    def plant_totals(self, totals):
+        table = pd.DataFrame({'Plant': self.plants.astype(str)})
+        for measure in ['Orders'] + NUMERIC_FIELDS:
+            table[measure] = np.bincount(self.group_plant, weights=totals[measure].to_numpy(dtype='float64'), minlength=len(table))
+        table['Orders'] = table['Orders'].astype(np.int64)
+        return self._fill_ratio(table[table['Orders'] > 0].reset_index(drop=True))
+    
+    # Site milik satu plant (slice dari total grup), hanya yang punya order pada selection
+    def plant_sites(self, totals, plant):
+        code = self.plants.get_indexer([plant])[0]
+        if code < 0:
+            return totals.iloc[0:0]
+        sites = totals.iloc[self.plant_offsets[code]:self.plant_offsets[code + 1]]
+        return sites[sites['Orders'] > 0]
+    
+    # Posisi baris (urut CreateDate) satu grup site yang juga ada di selection (terurut)
+    def site_rows(self, group, selection=None):
+        rows = self.group_rows[self.row_offsets[group]:self.row_offsets[group + 1]]
+        if selection is not None:
+            if not len(selection):
+                return rows[:0]
+            index = np.minimum(np.searchsorted(selection, rows), len(selection) - 1)
+            rows = rows[selection[index] == rows]
+        return rows
+
+# Konfigurasi distribusi lead time dan fill rate. Lead time per grup cube sudah pasti
+# (DeliveryDay - CreateDay), jadi cube adalah histogram lead time per hari yang bisa digabung.
+# Fill rate per order disimpan sebagai sketch histogram bin 1% per grup cube (format panjang:
+# kunci cube + FillBin + Orders); menggabungkan sketch = menjumlahkan Orders per bin.
+FILL_RATE_BIN_WIDTH = 0.01
+FILL_RATE_MAX_BIN = 150
+DISTRIBUTION_QUANTILES = [0.5, 0.9, 0.99]
+
+# Fungsi untuk quantile berbobot atas nilai diskrit (nilai terkecil yang kumulatif bobotnya >= q)
+def weighted_quantiles(values, weights, quantiles=DISTRIBUTION_QUANTILES):
+    values = np.asarray(values)
+    weights = np.asarray(weights, dtype='float64')
+    keep = weights > 0
+    if not keep.any():
+        return [np.nan] * len(quantiles)
+    unique, inverse = np.unique(values[keep], return_inverse=True)
+    cumulative = np.cumsum(np.bincount(inverse, weights=weights[keep]))
+    positions = np.searchsorted(cumulative, np.asarray(quantiles) * cumulative[-1], 'left')
+    return unique[np.minimum(positions, len(unique) - 1)].tolist()
+
+# Fungsi untuk distribusi lead time (hari) dari cube terfilter: quantile, rata-rata dan
+# histogram jumlah order per hari lead time. Biaya sebanding jumlah grup cube.
+def lead_time_distribution(cube):
+    if 'CreateDay' not in cube or 'DeliveryDay' not in cube:
+        return None
+    days = (cube['DeliveryDay'] - cube['CreateDay']).dt.days.to_numpy(dtype='float64', na_value=np.nan)
+    orders = cube['Orders'].to_numpy(dtype='float64')
+    keep = ~np.isnan(days) & (orders > 0)
+    days, orders = days[keep].astype(np.int64), orders[keep]
+    histogram = pd.Series(orders).groupby(days).sum() if len(days) else pd.Series(dtype='float64')
+    return {
+        'orders': int(orders.sum()),
+        'mean': float(np.average(days, weights=orders)) if len(days) else np.nan,
+        'quantiles': dict(zip(DISTRIBUTION_QUANTILES, weighted_quantiles(days, orders))),
+        'histogram': histogram
+    }
+
+# Fungsi untuk membangun sketch fill rate (ActualDelivery / OrderQty per order) per grup cube.
+# Order dengan OrderQty kosong/0 tidak punya fill rate dan tidak ikut.
+def build_fill_sketch(df, col_mapping):
+    if not (col_mapping.get('OrderQty') and col_mapping.get('ActualDelivery')):
+        return None
+    qty = df[col_mapping['OrderQty']].to_numpy(dtype='float64', na_value=np.nan)
+    actual = np.nan_to_num(df[col_mapping['ActualDelivery']].to_numpy(dtype='float64', na_value=np.nan))
+    valid = qty > 0
+    bins = np.clip(np.floor(actual[valid] / qty[valid] / FILL_RATE_BIN_WIDTH + 1e-9), 0, FILL_RATE_MAX_BIN).astype(np.int16)
+    keys = {}
+    for field, cube_col in CUBE_MAPPING.items():
+        col = col_mapping.get(field)
+        if col:
+            values = df[col][valid]
+            keys[cube_col] = values.dt.normalize() if field in DATE_FIELDS else values
+    frame = pd.DataFrame({**keys, 'FillBin': bins}).reset_index(drop=True)
+    sketch = frame.groupby(list(frame.columns), observed=True, dropna=False).size().rename('Orders').reset_index()
+    return finalize_order_cube(sketch)
+
+# Fungsi untuk memperbarui sketch fill rate secara inkremental: order lama dikurangi dari bin-nya,
+# order delta ditambahkan. Hanya grup yang disentuh delta yang dihitung ulang; grup baru disisipkan
+# sesuai urutan CreateDay, jadi biayanya tidak perlu regroup seluruh sketch.
+def update_fill_sketch(sketch, replaced_rows, added_rows, col_mapping):
+    removed = build_fill_sketch(replaced_rows, col_mapping)
+    removed['Orders'] = -removed['Orders']
+    change = pd.concat([removed, build_fill_sketch(added_rows, col_mapping)], ignore_index=True)
+    for col in ['Plant', 'Status']:
+        if col in change:
+            change[col] = change[col].astype(object)
+    keys = [col for col in sketch.columns if col != 'Orders']
+    change = change.groupby(keys, dropna=False, sort=False)['Orders'].sum().reset_index()
+    
+    positions = pd.MultiIndex.from_frame(sketch[keys]).get_indexer(pd.MultiIndex.from_frame(change[keys]))
+    found = positions >= 0
+    orders = sketch['Orders'].to_numpy().copy()
+    np.add.at(orders, positions[found], change['Orders'].to_numpy()[found])
+    sketch = sketch.copy(deep=False)
+    sketch['Orders'] = orders
+    new_groups, base_dtypes = align_delta(sketch, change[~found], {}, {})
+    sketch, _ = insert_by_create_date(sketch, new_groups, {'CreateDate': 'CreateDay'} if 'CreateDay' in sketch else {}, base_dtypes)
+    return sketch[sketch['Orders'] != 0].reset_index(drop=True)
+
+# Fungsi untuk distribusi fill rate dari sketch terfilter: quantile total, histogram per bin dan
+# quantile per plant (satu bincount 2D plant x bin, tanpa sort baris)
+def fill_rate_distribution(sketch):
+    bins = sketch['FillBin'].to_numpy(dtype=np.int64)
+    orders = sketch['Orders'].to_numpy(dtype='float64')
+    histogram = np.bincount(bins, weights=orders, minlength=FILL_RATE_MAX_BIN + 1)
+    levels = np.arange(FILL_RATE_MAX_BIN + 1) * FILL_RATE_BIN_WIDTH
+    result = {
+        'orders': int(orders.sum()),
+        'quantiles': dict(zip(DISTRIBUTION_QUANTILES, weighted_quantiles(levels, histogram))),
+        'histogram': pd.Series(histogram, index=levels),
+        'by_plant': pd.DataFrame(columns=['Plant', 'Orders', 'P10', 'P50', 'P90'])
+    }
+    if 'Plant' in sketch and len(sketch):
+        plants = sketch['Plant'].cat.categories
+        codes = sketch['Plant'].cat.codes.to_numpy(dtype=np.int64)
+        keep = codes >= 0
+        per_plant = np.bincount(codes[keep] * (FILL_RATE_MAX_BIN + 1) + bins[keep], weights=orders[keep],
+                                minlength=len(plants) * (FILL_RATE_MAX_BIN + 1)).reshape(len(plants), -1)
+        cumulative = per_plant.cumsum(axis=1)
+        totals = cumulative[:, -1]
+        rows = {'Plant': plants.astype(str), 'Orders': totals.astype(np.int64)}
+        for label, quantile in [('P10', 0.1), ('P50', 0.5), ('P90', 0.9)]:
+            positions = (cumulative < (quantile * totals)[:, None]).sum(axis=1)
+            rows[label] = np.minimum(positions, FILL_RATE_MAX_BIN) * FILL_RATE_BIN_WIDTH
+        by_plant = pd.DataFrame(rows)
+        result['by_plant'] = by_plant[by_plant['Orders'] > 0].reset_index(drop=True)
+    return result
+
+# Fungsi untuk membaca baris yang ditambahkan ke sumber lokal sebagai delta, dengan kolom, tag Source
+# dan plant yang sama seperti saat dataset penuh digabung. Sumber CSV berupa (nama, bytes) dari
+# read_appended_csv. Tabel SQLite diperlakukan sebagai log append: hanya baris dengan rowid > watermark
+# yang dibaca, tabel tanpa baris baru dilewati. Mengembalikan (None, watermark) kalau perubahan bukan
+# append murni (tabel bertambah/hilang, baris lama terhapus, atau tidak ada baris baru sama sekali).
+# Mengembalikan (frame delta, watermark baru).
+def ingest_delta(sources, col_mapping, columns, watermarks, header_row=0, plan_dir=None):
+    results = []
+    watermarks = {source: {table: list(mark) for table, mark in tables.items()} for source, tables in watermarks.items()}
+    for source in sources:
+        if isinstance(source, str) and source.endswith(SQLITE_EXTENSIONS):
+            name = source_name(source)
+            tables = list_sqlite_tables(source)
+            known = watermarks.get(source, {})
+            if set(tables) != set(known):
+                return None, watermarks
+            for table in tables:
+                max_rowid, rows = known[table]
+                with sqlite3.connect(f"file:{source}?mode=ro", uri=True) as con:
+                    kept = con.execute(f"SELECT COUNT(*) FROM {quote_identifier(table)} WHERE rowid <= ?", (max_rowid or 0,)).fetchone()[0]
+                if kept != rows:
+                    return None, watermarks
+                df, new_max_rowid = read_sqlite_table(source, table, max_rowid or 0)
+                if not len(df):
+                    continue
+                known[table] = [new_max_rowid, rows + len(df)]
+                results.append(normalize_sqlite_frame(df) + (f"{name} [{table}]",))
+        else:
+            results.extend(read_source_task(task) for task in list_source_tasks([source], header_row, plan_dir))
+    frames = []
+    for df, mapping, tag in results:
+        if not len(df) or not any(mapping.values()):
+            continue
+        df = df.rename(columns={col: col_mapping[field] for field, col in mapping.items() if col and col_mapping.get(field)})
+        if SOURCE_COLUMN in columns:
+            df[SOURCE_COLUMN] = tag
+        plant_col = col_mapping.get('PlantName')
+        if plant_col and plant_col not in df:
+            df[plant_col] = os.path.splitext(tag)[0]
+        frames.append(df)
+    if not frames:
+        return None, watermarks
+    return pd.concat(frames, ignore_index=True), watermarks
+
+# Backend SQL yang tersedia di environment ini (SQLite selalu ada di stdlib)
+SQL_BACKENDS = (['DuckDB'] if duckdb is not None else []) + ['SQLite']
+SQLITE_LOAD_CHUNK_ROWS = 100000
+
+# Fungsi untuk quoting nama kolom SQL
+def quote_identifier(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+# Kelas backend SQL tertanam (DuckDB atau SQLite). Filter, KPI dan agregasi chart
+# dijalankan sebagai query; yang kembali ke pandas hanya hasil agregasinya.
+# DuckDB membaca Parquet cache langsung (tanpa Parquet: salinan tabel di database in-memory),
+# SQLite memakai salinan tabel di file .sqlite.
+class SQLBackend:
+    def __init__(self, engine, col_mapping, parquet_path=None, df=None, sqlite_path=None):
+        self.engine = engine
+        self.col_mapping = col_mapping
+        self.lock = threading.Lock()
+        # Perkiraan memori yang dipegang backend (hanya salinan tabel DuckDB in-memory)
+        self.nbytes = 0
+        if engine == 'DuckDB':
+            self.con = duckdb.connect()
+            if parquet_path and os.path.exists(parquet_path):
+                path = parquet_path.replace("'", "''")
+                self.con.execute(f"CREATE VIEW orders AS SELECT * FROM read_parquet('{path}')")
+            else:
+                # Frame yang di-register hanya terlihat di koneksi ini, sedangkan query berjalan
+                # di cursor; jadi disalin ke tabel yang dibagi semua cursor
+                self.con.register('orders_df', df)
+                self.con.execute("CREATE TABLE orders AS SELECT * FROM orders_df")
+                self.con.unregister('orders_df')
+                self.nbytes = int(df.memory_usage(deep=True).sum())
+        else:
+            if not os.path.exists(sqlite_path):
+                self._build_sqlite(sqlite_path, df, parquet_path)
+            self.con = sqlite3.connect(sqlite_path, check_same_thread=False)
+    
+    # Menyalin baris ke file SQLite per chunk, lalu membuat index kolom filter
+    def _build_sqlite(self, sqlite_path, df, parquet_path):
+        if df is not None:
+            chunks = (df.iloc[start:start + SQLITE_LOAD_CHUNK_ROWS] for start in range(0, len(df), SQLITE_LOAD_CHUNK_ROWS))
+        else:
+            import pyarrow.parquet
+            batches = pyarrow.parquet.ParquetFile(parquet_path).iter_batches(batch_size=SQLITE_LOAD_CHUNK_ROWS)
+            chunks = (batch.to_pandas() for batch in batches)
+        con = sqlite3.connect(sqlite_path + '.tmp')
+        try:
+            for chunk in chunks:
+                chunk = chunk.copy()
+                for col in chunk.columns:
+                    if isinstance(chunk[col].dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(chunk[col]):
+                        chunk[col] = chunk[col].astype(object)
+                chunk.to_sql('orders', con, if_exists='append', index=False)
+            for field in CUBE_MAPPING:
+                col = self.col_mapping.get(field)
+                if col:
+                    con.execute(f"CREATE INDEX IF NOT EXISTS idx_{field} ON orders ({quote_identifier(col)})")
+            con.commit()
+        finally:
+            con.close()
+        os.replace(sqlite_path + '.tmp', sqlite_path)
+    
+    # Ekspresi SQL untuk memotong timestamp ke hari
+    def _day(self, col):
+        if self.engine == 'DuckDB':
+            return f"CAST(CAST({quote_identifier(col)} AS DATE) AS TIMESTAMP)"
+        return f"date({quote_identifier(col)})"
+    
+    # Parameter batas tanggal sesuai engine (SQLite menyimpan tanggal sebagai teks ISO)
+    def _date_param(self, timestamp):
+        if self.engine == 'DuckDB':
+            return timestamp.to_pydatetime()
+        return timestamp.strftime('%Y-%m-%d %H:%M:%S')
+    
+    # Klausa WHERE dengan semantik yang sama seperti FilterEngine (range per hari inklusif),
+    # ditambah pencarian teks opsional pada kolom search_columns
+    def _where(self, filters, search=None, search_columns=()):
+        conditions, params = [], []
+        for field, range_key in [('CreateDate', 'create_date_range'), ('DeliveryDate', 'delivery_date_range')]:
+            date_range = filters.get(range_key)
+            col = self.col_mapping.get(field)
+            if col and date_range and len(date_range) == 2:
+                start = pd.Timestamp(date_range[0]).normalize()
+                end = pd.Timestamp(date_range[1]).normalize() + pd.Timedelta(days=1)
+                conditions.append(f"{quote_identifier(col)} >= ? AND {quote_identifier(col)} < ?")
+                params += [self._date_param(start), self._date_param(end)]
+        for field, filter_key in [('PlantName', 'selected_plants'), ('Status', 'selected_status')]:
+            selected = filters.get(filter_key)
+            col = self.col_mapping.get(field)
+            if col and selected:
+                conditions.append(f"{quote_identifier(col)} IN ({', '.join('?' * len(selected))})")
+                params += [str(value) for value in selected]
+        if search and search_columns:
+            pattern = '%' + search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            like = 'ILIKE' if self.engine == 'DuckDB' else 'LIKE'
+            matches = [f"CAST({quote_identifier(col)} AS VARCHAR) {like} ? ESCAPE '\\'" for col in search_columns]
+            conditions.append('(' + ' OR '.join(matches) + ')')
+            params += [pattern] * len(search_columns)
+        return (' WHERE ' + ' AND '.join(conditions)) if conditions else '', params
+    
+    # Menjalankan query dan mengembalikan DataFrame
+    def _query(self, sql, params):
+        if self.engine == 'DuckDB':
+            return self.con.cursor().execute(sql, params).df()
+        with self.lock:
+            return pd.read_sql_query(sql, self.con, params=params)
+    
+    # Cube terfilter: GROUP BY (create day, delivery day, plant, status) di dalam engine
+    def query_cube(self, filters):
+        keys = []
+        for field, cube_col in CUBE_MAPPING.items():
+            col = self.col_mapping.get(field)
+            if col:
+                expression = self._day(col) if field in DATE_FIELDS else quote_identifier(col)
+                keys.append(f"{expression} AS {cube_col}")
+        measures = ['COUNT(*) AS Orders']
+        for measure in NUMERIC_FIELDS:
+            col = self.col_mapping.get(measure)
+            measures.append(f"COALESCE(SUM({quote_identifier(col)}), 0) AS {measure}" if col else f"0 AS {measure}")
+        where, params = self._where(filters)
+        sql = f"SELECT {', '.join(keys + measures)} FROM orders{where}"
+        if keys:
+            sql += ' GROUP BY ' + ', '.join(str(position) for position in range(1, len(keys) + 1))
+        cube = self._query(sql, params)
+        for cube_col in ['CreateDay', 'DeliveryDay']:
+            if cube_col in cube:
+                cube[cube_col] = pd.to_datetime(cube[cube_col])
+        return cube
+    
+    # Jumlah baris terfilter (untuk paginasi)
+    def count_rows(self, filters, search=None, search_columns=()):
+        where, params = self._where(filters, search, search_columns)
+        return int(self._query(f"SELECT COUNT(*) AS n FROM orders{where}", params)['n'].iloc[0])
+    
+    # Semua baris terfilter sebagai iterator chunk DataFrame (untuk export streaming)
+    def iter_rows(self, filters, columns, chunk_rows):
+        where, params = self._where(filters)
+        select = ', '.join(quote_identifier(col) for col in columns)
+        sql = f"SELECT {select} FROM orders{where}"
+        if self.engine == 'DuckDB':
+            result = self.con.cursor().execute(sql, params)
+            while True:
+                chunk = result.fetch_df_chunk(max(1, chunk_rows // 2048))
+                if chunk.empty:
+                    break
+                yield chunk
+        else:
+            with self.lock:
+                yield from pd.read_sql_query(sql, self.con, params=params, chunksize=chunk_rows)
+    
+    # Satu halaman baris detail terfilter, diurutkan di dalam engine
+    def query_rows(self, filters, columns, limit, offset=0, sort_column=None, ascending=True, search=None, search_columns=()):
+        where, params = self._where(filters, search, search_columns)
+        select = ', '.join(quote_identifier(col) for col in columns)
+        order = ''
+        if sort_column:
+            order = f" ORDER BY {quote_identifier(sort_column)} {'ASC' if ascending else 'DESC'} NULLS LAST"
+        rows = self._query(f"SELECT {select} FROM orders{where}{order} LIMIT {int(limit)} OFFSET {int(offset)}", params)
+        for field in DATE_FIELDS:
+            col = self.col_mapping.get(field)
+            if col and col in rows:
+                rows[col] = pd.to_datetime(rows[col])
+        return rows
+
+# Format export: label -> (ekstensi file, MIME type)
+EXPORT_FORMATS = {
+    'CSV': ('csv', 'text/csv'),
+    'CSV (gzip)': ('csv.gz', 'application/gzip'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'Excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+}
+EXPORT_CHUNK_ROWS = 100000
+EXCEL_MAX_ROWS = 1048575
+
+# Fungsi untuk menulis export per chunk ke file; chunks adalah iterator DataFrame.
+# File ditulis ke .tmp lalu di-rename, jadi export yang gagal tidak pernah dipakai ulang.
+def write_export(chunks, path, export_format, columns):
+    tmp_path = path + '.tmp'
+    if export_format in ('CSV', 'CSV (gzip)'):
+        opener = gzip.open if export_format == 'CSV (gzip)' else open
+        with opener(tmp_path, 'wt', newline='', encoding='utf-8') as f:
+            header = True
+            for chunk in chunks:
+                chunk.to_csv(f, index=False, header=header)
+                header = False
+            if header:
+                pd.DataFrame(columns=columns).to_csv(f, index=False)
+    elif export_format == 'Parquet':
+        import pyarrow
+        import pyarrow.parquet
+        writer = None
+        try:
+            for chunk in chunks:
+                table = pyarrow.Table.from_pandas(chunk, schema=writer.schema if writer else None, preserve_index=False)
+                if writer is None:
+                    writer = pyarrow.parquet.ParquetWriter(tmp_path, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None:
+            pd.DataFrame(columns=columns).to_parquet(tmp_path, index=False)
+    elif export_format == 'Excel':
+        from openpyxl import Workbook
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet('Orders')
+        sheet.append(list(columns))
+        written = 0
+        for chunk in chunks:
+            written += len(chunk)
+            if written > EXCEL_MAX_ROWS:
+                break
+            for row in chunk.astype(object).where(chunk.notna(), None).itertuples(index=False):
+                sheet.append(list(row))
+        workbook.save(tmp_path)
+        # Lebih dari satu sheet Excel: ditolak, bukan dipotong diam-diam
+        if written > EXCEL_MAX_ROWS:
+            os.remove(tmp_path)
+            raise ValueError(f"Excel export is limited to {EXCEL_MAX_ROWS:,} rows; use CSV or Parquet")
+    else:
+        raise ValueError(f"Unknown export format: {export_format}")
+    os.replace(tmp_path, path)
@@ -0,0 +1,202 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+# Instrumentasi per tahap (waktu, baris masuk/keluar, delta memori). Biayanya per tahap hanya
+# perf_counter dan dua kali baca /proc/self/statm, jadi aman untuk selalu aktif.
+# Tahap dicatat ke run yang aktif di thread ini (satu run per eksekusi script/fragment);
+# tanpa run aktif (CLI, worker ingestion) stage() tidak melakukan apa-apa.
+
+STAGE_BUCKETS = [0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30]
+METRIC_PREFIX = 'order_dashboard'
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+_local = threading.local()
+
+# Fungsi untuk RSS proses saat ini dalam byte (None kalau /proc tidak tersedia)
+def current_rss():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+# Catatan satu run: daftar tahap sesuai urutan mulai, dengan kedalaman untuk tahap bersarang
+class RunRecord:
+    def __init__(self, name):
+        self.name = name
+        self.timestamp = time.time()
+        self.started = time.perf_counter()
+        self.start_rss = current_rss()
+        self.stages = []
+        self.depth = 0
+        self.seconds = None
+        self.memory_delta = None
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self.started
+        end_rss = current_rss()
+        if self.start_rss is not None and end_rss is not None:
+            self.memory_delta = end_rss - self.start_rss
+        return self
+
+    def to_dict(self):
+        return {
+            'run': self.name,
+            'timestamp': round(self.timestamp, 3),
+            'seconds': round(self.seconds or 0.0, 6),
+            'memory_delta': self.memory_delta,
+            'stages': self.stages
+        }
+
+# Fungsi untuk memulai run baru di thread ini (run lama yang tidak selesai, mis. karena st.rerun, dibuang)
+def begin_run(name):
+    _local.run = RunRecord(name)
+    return _local.run
+
+# Fungsi untuk menutup run aktif di thread ini; None kalau tidak ada
+def end_run():
+    run = getattr(_local, 'run', None)
+    _local.run = None
+    return run.finish() if run is not None else None
+
+# Fungsi untuk run yang aktif di thread ini
+def active_run():
+    return getattr(_local, 'run', None)
+
+# Context manager untuk run: kalau sudah ada run aktif (fragment yang dijalankan di dalam script
+# penuh), tahapnya masuk ke run itu; kalau tidak, run baru dibuat lalu diteruskan ke publish
+@contextmanager
+def track_run(name, publish=None):
+    if active_run() is not None:
+        yield active_run()
+        return
+    run = begin_run(name)
+    try:
+        yield run
+    finally:
+        end_run()
+        if publish is not None:
+            publish(run)
+
+# Context manager untuk satu tahap. Record yang di-yield boleh diisi rows_out oleh pemanggil.
+@contextmanager
+def stage(name, rows_in=None):
+    run = active_run()
+    record = {'stage': name, 'rows_in': rows_in, 'rows_out': None}
+    if run is None:
+        yield record
+        return
+    record['depth'] = run.depth
+    run.stages.append(record)
+    run.depth += 1
+    start_rss = current_rss()
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record['seconds'] = round(time.perf_counter() - start, 6)
+        end_rss = current_rss()
+        record['memory_delta'] = end_rss - start_rss if start_rss is not None and end_rss is not None else None
+        run.depth -= 1
+
+# Agregat process-wide semua run: histogram waktu, total baris, delta memori terakhir.
+# Setiap run yang selesai ditulis ke log JSON lines dan file metrics format teks Prometheus
+# (untuk textfile collector node_exporter).
+class StageMetrics:
+    def __init__(self, metrics_path=None, log_path=None):
+        self.metrics_path = metrics_path
+        self.stages = {}
+        self.runs = {}
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger('order_dashboard.metrics')
+        if log_path and not self.logger.handlers:
+            os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+            handler = RotatingFileHandler(log_path, maxBytes=10 * 1024 * 1024, backupCount=3, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            self.logger.addHandler(handler)
+            self.logger.setLevel(logging.INFO)
+            self.logger.propagate = False
+
+    @staticmethod
+    def _new_series():
+        return {'count': 0, 'seconds': 0.0, 'buckets': [0] * len(STAGE_BUCKETS), 'rows_in': 0, 'rows_out': 0, 'last_seconds': 0.0, 'memory_delta': None}
+
+    @staticmethod
+    def _observe(series, seconds, memory_delta, rows_in=None, rows_out=None):
+        series['count'] += 1
+        series['seconds'] += seconds
+        series['last_seconds'] = seconds
+        for index, bound in enumerate(STAGE_BUCKETS):
+            if seconds <= bound:
+                series['buckets'][index] += 1
+        series['rows_in'] += rows_in or 0
+        series['rows_out'] += rows_out or 0
+        if memory_delta is not None:
+            series['memory_delta'] = memory_delta
+
+    def publish(self, run):
+        with self.lock:
+            self._observe(self.runs.setdefault(run.name, self._new_series()), run.seconds, run.memory_delta)
+            for record in run.stages:
+                series = self.stages.setdefault((run.name, record['stage']), self._new_series())
+                self._observe(series, record['seconds'], record['memory_delta'], record['rows_in'], record['rows_out'])
+            text = self.render() if self.metrics_path else None
+        if self.logger.handlers:
+            self.logger.info(json.dumps(run.to_dict(), default=str))
+        if text is not None:
+            self._write(text)
+
+    # Ringkasan per tahap untuk panel diagnostik
+    def summary(self):
+        with self.lock:
+            return [
+                {'run': run_name, 'stage': stage_name, 'count': series['count'],
+                 'mean_seconds': series['seconds'] / series['count'], 'last_seconds': series['last_seconds']}
+                for (run_name, stage_name), series in self.stages.items()
+            ]
+
+    def _write(self, text):
+        os.makedirs(os.path.dirname(os.path.abspath(self.metrics_path)), exist_ok=True)
+        tmp_path = f"{self.metrics_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, self.metrics_path)
+
+    # Format teks Prometheus (dipanggil dengan lock dipegang)
+    def render(self):
+        lines = []
+        def histogram(metric, help_text, items):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} histogram")
+            for labels, series in items:
+                for bound, count in zip(STAGE_BUCKETS, series['buckets']):
+                    lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {series["count"]}')
+                lines.append(f"{metric}_sum{{{labels}}} {series['seconds']:.6f}")
+                lines.append(f"{metric}_count{{{labels}}} {series['count']}")
+        def simple(metric, kind, help_text, items, field):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for labels, series in items:
+                if series[field] is not None:
+                    lines.append(f"{metric}{{{labels}}} {series[field]}")
+
+        runs = [(f'run="{name}"', series) for name, series in sorted(self.runs.items())]
+        stages = [(f'run="{run_name}",stage="{stage_name}"', series) for (run_name, stage_name), series in sorted(self.stages.items())]
+        histogram(f"{METRIC_PREFIX}_run_seconds", "Wall time of a script or fragment run.", runs)
+        histogram(f"{METRIC_PREFIX}_stage_seconds", "Wall time per dashboard stage.", stages)
+        simple(f"{METRIC_PREFIX}_stage_rows_in_total", 'counter', "Rows going into a stage.", stages, 'rows_in')
+        simple(f"{METRIC_PREFIX}_stage_rows_out_total", 'counter', "Rows coming out of a stage.", stages, 'rows_out')
+        simple(f"{METRIC_PREFIX}_stage_memory_delta_bytes", 'gauge', "Process RSS change during the last run of a stage.", stages, 'memory_delta')
+        simple(f"{METRIC_PREFIX}_run_memory_delta_bytes", 'gauge', "Process RSS change during the last run.", runs, 'memory_delta')
+        rss = current_rss()
+        if rss is not None:
+            lines.append(f"# HELP {METRIC_PREFIX}_resident_memory_bytes Process resident memory.")
+            lines.append(f"# TYPE {METRIC_PREFIX}_resident_memory_bytes gauge")
+            lines.append(f"{METRIC_PREFIX}_resident_memory_bytes {rss}")
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,117 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Generator export order sintetis dengan kolom yang dikenali find_column (untuk benchmark dan demo)
+
+COLUMNS = ['Order ID', 'Site No', 'Site Name', 'Create Date', 'Delivery Date', 'Plant Name', 'Order Qty', 'Actual Delivery', 'Status']
+BASE_STATUSES = ['Delivered', 'Pending', 'On Booking', 'Cancelled', 'Pending Confirmation', 'Booking', 'Canceled']
+STATUS_WEIGHTS = [0.45, 0.2, 0.12, 0.08, 0.07, 0.05, 0.03]
+XLSX_SHEET_ROWS = 1048575
+CHUNK_ROWS = 500000
+
+# Fungsi untuk daftar status dengan kardinalitas tertentu (status tambahan diberi nomor)
+def status_values(n_statuses):
+    statuses = BASE_STATUSES[:n_statuses] + [f"Status {i}" for i in range(len(BASE_STATUSES), n_statuses)]
+    weights = np.array(STATUS_WEIGHTS[:n_statuses] + [0.02] * max(0, n_statuses - len(BASE_STATUSES)))
+    return statuses, weights / weights.sum()
+
+# Fungsi untuk satu chunk order sintetis, mulai dari nomor order `start`
+def generate_chunk(rng, start, n_rows, n_plants=10, n_statuses=4, n_sites=500, start_date='2024-01-01', days=365,
+                   dirty=0.0, date_format='%Y-%m-%d'):
+    statuses, weights = status_values(n_statuses)
+    status = np.array(statuses, dtype=object)[rng.choice(len(statuses), n_rows, p=weights)]
+    site = rng.integers(1, n_sites + 1, n_rows)
+    create = pd.Timestamp(start_date) + pd.to_timedelta(rng.integers(0, days, n_rows), unit='D')
+    delivery = create + pd.to_timedelta(np.ceil(rng.gamma(2.0, 1.5, n_rows)), unit='D')
+    order_qty = np.maximum(1, rng.lognormal(2.0, 0.6, n_rows).round()).astype(np.int64)
+    delivered = np.isin(status, ['Delivered'])
+    actual = np.where(delivered, order_qty - rng.binomial(order_qty, 0.05), np.where(np.isin(status, ['Pending', 'Pending Confirmation', 'Cancelled', 'Canceled']), 0, rng.binomial(order_qty, 0.5)))
+
+    chunk = pd.DataFrame({
+        'Order ID': [f"SO{number:09d}" for number in range(start, start + n_rows)],
+        'Site No': site,
+        'Site Name': np.char.add('Site ', site.astype(str)),
+        'Create Date': create.strftime(date_format),
+        'Delivery Date': delivery.strftime(date_format),
+        'Plant Name': np.char.add('Plant ', (site % n_plants + 1).astype(str)),
+        'Order Qty': order_qty,
+        'Actual Delivery': actual,
+        'Status': status
+    })
+    if dirty > 0:
+        chunk = add_dirty_values(rng, chunk, dirty)
+    return chunk
+
+# Fungsi untuk menambahkan nilai kotor seperti export asli: sel kosong, "n/a" di kolom angka,
+# spasi/huruf besar di status, tanggal rusak
+def add_dirty_values(rng, chunk, dirty):
+    chunk = chunk.astype({'Order Qty': object, 'Actual Delivery': object})
+    n_rows = len(chunk)
+    for col, value in [('Order Qty', 'n/a'), ('Actual Delivery', ''), ('Create Date', 'N/A'), ('Delivery Date', '00/00/0000'), ('Plant Name', None)]:
+        mask = rng.random(n_rows) < dirty / 5
+        chunk.loc[mask, col] = value
+    mask = rng.random(n_rows) < dirty
+    chunk.loc[mask, 'Status'] = chunk.loc[mask, 'Status'].str.upper() + ' '
+    return chunk
+
+# Fungsi untuk menulis export sintetis ke CSV (per chunk) atau XLSX (sheet baru per 1.048.575 baris)
+def write_orders(path, n_rows, seed=0, chunk_rows=CHUNK_ROWS, **options):
+    rng = np.random.default_rng(seed)
+    chunks = (
+        generate_chunk(rng, start, min(chunk_rows, n_rows - start), **options)
+        for start in range(0, n_rows, chunk_rows)
+    )
+    tmp_path = path + '.tmp'
+    if path.endswith('.csv'):
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            for index, chunk in enumerate(chunks):
+                chunk.to_csv(f, index=False, header=index == 0)
+    elif path.endswith('.xlsx'):
+        from openpyxl import Workbook
+        workbook = Workbook(write_only=True)
+        sheet, sheet_rows = None, XLSX_SHEET_ROWS
+        for chunk in chunks:
+            for row in chunk.itertuples(index=False):
+                if sheet_rows >= XLSX_SHEET_ROWS:
+                    sheet = workbook.create_sheet(f"Orders {len(workbook.worksheets) + 1}")
+                    sheet.append(COLUMNS)
+                    sheet_rows = 0
+                sheet.append(list(row))
+                sheet_rows += 1
+        workbook.save(tmp_path)
+    else:
+        raise ValueError(f"Unsupported output format: {path}")
+    os.replace(tmp_path, path)
+    return path
+
+# Fungsi untuk argumen command line
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic order export (CSV or XLSX).")
+    parser.add_argument('output', help="Output file, .csv or .xlsx")
+    parser.add_argument('--rows', type=int, default=10000, help="Number of orders (default: 10000)")
+    parser.add_argument('--plants', type=int, default=10, help="Plant cardinality (default: 10)")
+    parser.add_argument('--statuses', type=int, default=4, help="Status cardinality (default: 4)")
+    parser.add_argument('--sites', type=int, default=500, help="Site cardinality (default: 500)")
+    parser.add_argument('--start-date', default='2024-01-01', help="First create date (default: 2024-01-01)")
+    parser.add_argument('--days', type=int, default=365, help="Create date span in days (default: 365)")
+    parser.add_argument('--dirty', type=float, default=0.0, help="Fraction of rows with dirty values (default: 0)")
+    parser.add_argument('--date-format', default='%Y-%m-%d', help="Date format in the export (default: %%Y-%%m-%%d)")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed (default: 0)")
+    return parser.parse_args(argv)
+
+# Entry point command line: python order_synth.py orders.csv --rows 1000000 --plants 50
+def main(argv=None):
+    args = parse_args(argv)
+    write_orders(
+        args.output, args.rows, seed=args.seed, n_plants=args.plants, n_statuses=args.statuses, n_sites=args.sites,
+        start_date=args.start_date, days=args.days, dirty=args.dirty, date_format=args.date_format
+    )
+    print(f"Wrote {args.rows:,} orders to {args.output}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,23 @@
+import json
+
+import numpy as np
+import pytest
+
+from order_cli import main
+from order_synth import generate_chunk
+
+
+def test_invalid_date_is_an_argument_error(tmp_path, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        main([str(tmp_path), '--create-from', 'garbage'])
+    assert exit_info.value.code == 2
+    assert "invalid date: 'garbage'" in capsys.readouterr().err
+
+
+def test_date_filters_limit_report(tmp_path, capsys):
+    generate_chunk(np.random.default_rng(0), 0, 500).to_csv(tmp_path / 'orders.csv', index=False)
+    assert main([str(tmp_path / 'orders.csv'), '--plan-dir', str(tmp_path / 'profiles')]) == 0
+    total = json.loads(capsys.readouterr().out)['rows']
+    assert main([str(tmp_path / 'orders.csv'), '--plan-dir', str(tmp_path / 'profiles'), '--create-from', '2024-03-01', '--create-to', '2024-03-31']) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert 0 < report['kpis']['total_orders'] < total
@@ -0,0 +1,166 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from order_core import (
+    FilterEngine, SQLBackend, SiteRollups, StatusKpiKernel, append_orders, build_fill_sketch, build_order_cube,
+    ingest_sources, list_source_tasks, load_status_map, order_keys, read_source_task, update_fill_sketch,
+    update_order_cube, upsert_orders
+)
+from order_synth import generate_chunk
+
+FILTERS = {
+    'create_date_range': (pd.Timestamp('2024-02-01'), pd.Timestamp('2024-05-31')),
+    'delivery_date_range': (pd.Timestamp('2024-02-10'), pd.Timestamp('2024-06-15')),
+    'selected_plants': ['Plant 1', 'Plant 3', 'Plant 7'],
+    'selected_status': ['Delivered', 'Pending']
+}
+
+
+# Fungsi untuk menulis order sintetis ke CSV lalu membacanya seperti dashboard
+def load_orders(tmp_path, name='orders.csv', start=0, n_rows=2000, seed=0, **options):
+    path = str(tmp_path / name)
+    generate_chunk(np.random.default_rng(seed), start, n_rows, n_sites=40, **options).to_csv(path, index=False)
+    return path, ingest_sources([path])
+
+
+# Fungsi untuk membandingkan dua frame tanpa melihat urutan baris dan kode kategori
+def assert_same_rows(left, right, by):
+    frames = [
+        df.astype({col: str for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)}).sort_values(by, ignore_index=True)
+        for df in (left, right)
+    ]
+    pd.testing.assert_frame_equal(*frames, check_dtype=False)
+
+
+# Fungsi untuk membandingkan cube berdasarkan kunci grupnya
+def assert_same_cube(left, right):
+    keys = ['CreateDay', 'DeliveryDay', 'Plant', 'Status']
+    assert_same_rows(left[keys + ['Orders', 'OrderQty', 'ActualDelivery']], right[keys + ['Orders', 'OrderQty', 'ActualDelivery']], keys)
+
+
+def test_filter_engine_matches_naive_masks(tmp_path):
+    _, (df, col_mapping) = load_orders(tmp_path)
+    create = df[col_mapping['CreateDate']].dt.normalize()
+    delivery = df[col_mapping['DeliveryDate']].dt.normalize()
+    mask = (
+        create.between(*FILTERS['create_date_range'])
+        & delivery.between(*FILTERS['delivery_date_range'])
+        & df[col_mapping['PlantName']].isin(FILTERS['selected_plants'])
+        & df[col_mapping['Status']].isin(FILTERS['selected_status'])
+    )
+    engine = FilterEngine(df, col_mapping)
+    np.testing.assert_array_equal(engine.select(FILTERS), np.flatnonzero(mask))
+    np.testing.assert_array_equal(engine.select({}), np.arange(len(df)))
+    only_delivery = {'delivery_date_range': FILTERS['delivery_date_range']}
+    np.testing.assert_array_equal(engine.select(only_delivery), np.flatnonzero(delivery.between(*FILTERS['delivery_date_range'])))
+
+
+def test_parsing_plan_reused_across_differing_files(tmp_path):
+    plan_dir = str(tmp_path / 'profiles')
+    clean = generate_chunk(np.random.default_rng(0), 0, 50)
+    dirty = generate_chunk(np.random.default_rng(1), 50, 50, date_format='%m/%d/%Y').astype({'Order Qty': object})
+    dirty.loc[0, 'Order Qty'] = '1.5'
+    dirty.loc[1, 'Order Qty'] = 'n/a'
+    clean.to_csv(tmp_path / 'a.csv', index=False)
+    dirty.to_csv(tmp_path / 'b.csv', index=False)
+
+    # Dua kali: pertama plan dibuat dari a.csv, kedua plan tersimpan dipakai ulang untuk keduanya
+    for _ in range(2):
+        tasks = list_source_tasks([str(tmp_path / 'a.csv'), str(tmp_path / 'b.csv')], 0, plan_dir)
+        (a, a_mapping, _), (b, b_mapping, _) = [read_source_task(task) for task in tasks]
+        assert a[a_mapping['CreateDate']].notna().all()
+        assert b[b_mapping['CreateDate']].notna().all()
+        assert b[b_mapping['DeliveryDate']].iloc[0] == pd.Timestamp(dirty.loc[0, 'Delivery Date'])
+        assert b[b_mapping['OrderQty']].iloc[0] == 1.5
+        assert pd.isna(b[b_mapping['OrderQty']].iloc[1])
+        assert (b[b_mapping['OrderQty']].iloc[2:].to_numpy() == dirty['Order Qty'].iloc[2:].astype(float).to_numpy()).all()
+
+
+@pytest.mark.parametrize('engine', ['DuckDB', 'SQLite'])
+def test_sql_backend_matches_filter_engine(tmp_path, engine):
+    if engine == 'DuckDB':
+        pytest.importorskip('duckdb')
+    _, (df, col_mapping) = load_orders(tmp_path)
+    backend = SQLBackend(engine, col_mapping, df=df, sqlite_path=str(tmp_path / 'orders.sqlite'))
+    assert backend.count_rows(FILTERS) == len(FilterEngine(df, col_mapping).select(FILTERS))
+    assert backend.count_rows({}) == len(df)
+
+
+def test_upsert_and_cube_update_match_rebuild(tmp_path):
+    _, (df, col_mapping) = load_orders(tmp_path)
+    _, (changed, _) = load_orders(tmp_path, 'changed.csv', seed=1)
+    _, (new, _) = load_orders(tmp_path, 'new.csv', start=2000, n_rows=300, seed=2)
+    delta = pd.concat([changed.iloc[100:400], new], ignore_index=True)
+    order_col = col_mapping['OrderID']
+
+    merged, replaced, added = upsert_orders(df, delta, col_mapping, col_mapping, pd.Index(order_keys(df[order_col])))
+    expected = pd.concat([df[~df[order_col].isin(delta[order_col])], delta], ignore_index=True)
+    assert len(replaced) == 300 and len(added) == 600
+    assert merged[col_mapping['CreateDate']].is_monotonic_increasing
+    assert_same_rows(merged, expected, [order_col])
+    assert_same_cube(update_order_cube(build_order_cube(df, col_mapping), replaced, added, col_mapping), build_order_cube(expected, col_mapping))
+
+
+def test_append_matches_full_reload(tmp_path):
+    path, (df, col_mapping) = load_orders(tmp_path)
+    tail = generate_chunk(np.random.default_rng(3), 2000, 200, n_sites=40)
+    with open(path, 'a', newline='') as f:
+        tail.to_csv(f, index=False, header=False)
+    full, _ = ingest_sources([path])
+    delta, delta_mapping = ingest_sources([('tail.csv', tail.to_csv(index=False).encode('utf-8'))])
+
+    merged, added = append_orders(df, delta, col_mapping, delta_mapping)
+    assert len(added) == 200
+    assert_same_rows(merged, full, [col_mapping['OrderID']])
+    assert_same_cube(update_order_cube(build_order_cube(df, col_mapping), df.iloc[:0], added, col_mapping), build_order_cube(full, col_mapping))
+
+
+def test_site_rollups_match_groupby(tmp_path):
+    _, (df, col_mapping) = load_orders(tmp_path)
+    rollups = SiteRollups(df, col_mapping)
+    plant, site = col_mapping['PlantName'], col_mapping['SiteNo']
+
+    selection = FilterEngine(df, col_mapping).select(FILTERS)
+    for rows in [df, df.iloc[selection]]:
+        totals = rollups.totals(None if rows is df else selection)
+        totals = totals[totals['Orders'] > 0]
+        expected = rows.groupby([plant, site], observed=True).agg(
+            Orders=(col_mapping['OrderQty'], 'size'),
+            OrderQty=(col_mapping['OrderQty'], 'sum'),
+            ActualDelivery=(col_mapping['ActualDelivery'], 'sum')
+        ).reset_index().rename(columns={plant: 'Plant'})
+        assert_same_rows(totals[['Plant', site, 'Orders', 'OrderQty', 'ActualDelivery']], expected, ['Plant', site])
+
+        by_plant = rows.groupby(plant, observed=True)[col_mapping['OrderQty']].agg(['size', 'sum'])
+        plant_totals = rollups.plant_totals(rollups.totals(None if rows is df else selection)).set_index('Plant')
+        np.testing.assert_array_equal(plant_totals.loc[by_plant.index.astype(str), 'Orders'], by_plant['size'])
+        np.testing.assert_allclose(plant_totals.loc[by_plant.index.astype(str), 'OrderQty'], by_plant['sum'])
+
+
+def test_fill_sketch_update_matches_rebuild(tmp_path):
+    _, (df, col_mapping) = load_orders(tmp_path)
+    _, (changed, _) = load_orders(tmp_path, 'changed.csv', seed=1)
+    _, (new, _) = load_orders(tmp_path, 'new.csv', start=2000, n_rows=300, seed=2)
+    delta = pd.concat([changed.iloc[100:400], new], ignore_index=True)
+    order_col = col_mapping['OrderID']
+
+    merged, replaced, added = upsert_orders(df, delta, col_mapping, col_mapping, pd.Index(order_keys(df[order_col])))
+    sketch = update_fill_sketch(build_fill_sketch(df, col_mapping), replaced, added, col_mapping)
+    assert_same_rows(sketch, build_fill_sketch(merged, col_mapping), ['CreateDay', 'DeliveryDay', 'Plant', 'Status', 'FillBin'])
+
+
+def test_status_map_overrides_match_canonical_status(tmp_path):
+    path = tmp_path / 'status_map.json'
+    path.write_text(json.dumps({'delivered': None, ' ON  booking ': 'CANCEL', 'Shipped': 'DELIVERED'}))
+    status_map = load_status_map(str(path))
+    assert 'delivered' not in status_map
+    assert status_map['on booking'] == 'CANCEL'
+    assert status_map['shipped'] == 'DELIVERED'
+
+    kernel = StatusKpiKernel(status_map)
+    categories = pd.Index(['Delivered', 'On Booking', 'SHIPPED', 'Pending'])
+    buckets = [kernel.buckets[slot] if slot >= 0 else None for slot in kernel.slot_buckets(categories)[1:]]
+    assert buckets == [None, 'CANCEL', 'DELIVERED', 'PENDING']